@@ -0,0 +1,119 @@
+from ThumbnailCache import getImageSize, readReduced
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+class AnalysisWorker(QObject):
+    # image, model name, original image, annotated image, text, predictions, bounding boxes
+    imageAnalyzed = pyqtSignal(object, str, object, object, str, object, object)
+    imageFailed = pyqtSignal(object, str)
+    # per-stage timing record of one analysis
+    imageTimed = pyqtSignal(object)
+    modelFailed = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int, int, bool)
+
+    def __init__(self, image_analyzer, images, model_name, batch_analyzer=None, exporter=None, display_side=1024):
+        super().__init__()
+        self.image_analyzer = image_analyzer
+        self.batch_analyzer = batch_analyzer
+        # Optional StreamingExporter, fed from this thread so a slow disk holds back the analysis
+        self.exporter = exporter
+        self.images = list(images)
+        self.model_name = model_name
+        # Longest side of the images shown for the results of the batch engine
+        self.display_side = display_side
+        self.cancelled = False
+        self.successful_analyses = 0
+
+    def cancel(self):
+        self.cancelled = True
+        if self.batch_analyzer is not None:
+            self.batch_analyzer.cancel()
+
+    @pyqtSlot()
+    def run(self):
+        # Several images are sharded across the worker processes of the batch engine
+        try:
+            if self.batch_analyzer is not None and len(self.images) > 1:
+                self.runBatch()
+            else:
+                self.runSequential()
+        finally:
+            if self.exporter is not None:
+                self.exporter.close()
+        self.finished.emit(self.successful_analyses, len(self.images), self.cancelled)
+
+    def runBatch(self):
+        total_images = len(self.images)
+        try:
+            results = self.batch_analyzer.analyze([image.path for image in self.images], self.model_name,
+                                                  encode_images=self.exporter is not None)
+            for i, (image, (_, result, error)) in enumerate(zip(self.images, results), 1):
+                if self.cancelled:
+                    break
+                if error is not None:
+                    self.imageFailed.emit(image, str(error))
+                else:
+                    self.successful_analyses += 1
+                    self.emitTimings(self.batch_analyzer.stage_timer)
+                    self.emitReducedResult(image, result)
+                self.progress.emit(i, total_images)
+        except Exception as e:
+            self.modelFailed.emit(str(e))
+
+    def runSequential(self):
+        total_images = len(self.images)
+        try:
+            self.image_analyzer.setModel(self.model_name)
+        except Exception as e:
+            self.modelFailed.emit(str(e))
+            return
+
+        for i, image in enumerate(self.images, 1):
+            if self.cancelled:
+                break
+            try:
+                original_image, *result = self.image_analyzer.analyzeFile(image.path)
+                self.successful_analyses += 1
+                self.emitResult(image, original_image, result)
+            except Exception as e:
+                self.imageFailed.emit(image, str(e))
+            self.emitTimings(self.image_analyzer.stage_timer)
+            self.progress.emit(i, total_images)
+
+    def emitReducedResult(self, image, result):
+        # The workers send back the annotated image only encoded for the exporter, the boxes
+        # are drawn again on a reduced decode of the original for display
+        encoded_image, text, predictions, bounding_boxes = result
+        original_image = readReduced(image.path, self.display_side)
+        annotated_image = None
+        if original_image is not None:
+            size = getImageSize(image.path)
+            scale = original_image.shape[1] / size[0] if size else 1.0
+            annotated_image = self.image_analyzer.box_drawer.drawBoxes(original_image.copy(), bounding_boxes,
+                                                                       predictions, scale)
+        if self.exporter is not None:
+            self.exporter.submit(image.path, {
+                'model': self.model_name,
+                'text': text,
+                'predictions': predictions,
+                'bounding_boxes': bounding_boxes
+            }, encoded_image)
+        self.imageAnalyzed.emit(image, self.model_name, original_image, annotated_image,
+                                text, predictions, bounding_boxes)
+
+    def emitResult(self, image, original_image, result):
+        annotated_image, text, predictions, bounding_boxes = result
+        if self.exporter is not None:
+            self.exporter.submit(image.path, {
+                'model': self.model_name,
+                'text': text,
+                'predictions': predictions,
+                'bounding_boxes': bounding_boxes
+            }, annotated_image)
+        self.imageAnalyzed.emit(image, self.model_name, original_image, annotated_image,
+                                text, predictions, bounding_boxes)
+
+    def emitTimings(self, stage_timer):
+        timings = stage_timer.getLastTimings()
+        if timings is not None:
+            self.imageTimed.emit(timings)
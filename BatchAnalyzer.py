@@ -0,0 +1,115 @@
+import os
+import multiprocessing
+import cv2
+from concurrent.futures import ProcessPoolExecutor
+from StageTimer import StageTimer
+
+# Analyzer owned by each worker process, built once by the pool initializer
+_worker_analyzer = None
+
+def _initWorker(model_manager, max_batch_size, result_cache, working_scale, backend, ocr_tile_size,
+                ocr_tile_overlap, detection_cache):
+    global _worker_analyzer
+    import cv2
+    # Every process already owns a core, so keep OpenCV, preprocessing and inference single-threaded
+    cv2.setNumThreads(1)
+    from ImageAnalyzer import ImageAnalyzer
+    _worker_analyzer = ImageAnalyzer(model_manager, max_batch_size=max_batch_size,
+                                     result_cache=result_cache, working_scale=working_scale,
+                                     preprocess_workers=1, backend=backend, ocr_tile_size=ocr_tile_size,
+                                     ocr_tile_overlap=ocr_tile_overlap, ocr_tile_workers=1, inference_threads=1,
+                                     detection_cache=detection_cache)
+
+def _analyzeInWorker(image_path, model_name, model_info, encode_image):
+    # The pool outlives the models known when it started, so the model info comes with every task.
+    # A model added or registered again in the parent replaces the copy of the worker.
+    model_manager = _worker_analyzer.model_manager
+    if model_manager.getModel(model_name) != model_info:
+        model_manager.setModelInfo(model_name, model_info)
+        _worker_analyzer.forgetModel(model_name)
+    if _worker_analyzer.model_name != model_name:
+        _worker_analyzer.setModel(model_name)
+    result = _worker_analyzer.analyze(image_path)
+    # Annotated pages of large scans are heavy to send back as arrays. For the exporters they come
+    # back encoded like the original file, which is what gets written, otherwise not at all.
+    annotated_image = None
+    if encode_image:
+        try:
+            encoded, buffer = cv2.imencode(os.path.splitext(image_path)[1], result[0])
+            annotated_image = buffer.tobytes() if encoded else None
+        except cv2.error:
+            pass
+    result = (annotated_image,) + result[1:]
+    # The stage timings are recorded in the worker, send them back with the result
+    return result, _worker_analyzer.getLastTimings()
+
+class BatchAnalyzer:
+    def __init__(self, model_manager, workers=None, max_batch_size=256, result_cache=None, working_scale=None,
+                 backend='keras', stage_timer=None, ocr_tile_size=None, ocr_tile_overlap=256, detection_cache=None):
+        self.model_manager = model_manager
+        self.backend = backend
+        self.result_cache = result_cache
+        self.working_scale = working_scale
+        self.ocr_tile_size = ocr_tile_size
+        self.ocr_tile_overlap = ocr_tile_overlap
+        # OCR detections on disk, so an image is read once whichever worker gets it next time
+        self.detection_cache = detection_cache
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch_size = max_batch_size
+        self.executor = None
+        self.pending = []
+        self.stage_timer = stage_timer or StageTimer()
+
+    def getExecutor(self):
+        # The pool is kept alive between batches so OCR readers and models stay loaded.
+        # Workers are spawned, TensorFlow is not safe to use after a fork.
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_initWorker,
+                initargs=(self.model_manager, self.max_batch_size, self.result_cache, self.working_scale,
+                          self.backend, self.ocr_tile_size, self.ocr_tile_overlap, self.detection_cache)
+            )
+        return self.executor
+
+    def analyze(self, image_paths, model_name, result_manager=None, encode_images=False):
+        # Yields (image_path, result, error) in submission order, where result is the
+        # (annotated_image, text, predictions, bounding_boxes) tuple of ImageAnalyzer.analyze.
+        # The annotated image is None, or with encode_images the bytes of the image file.
+        model_info = self.model_manager.getModel(model_name)
+        if model_info is None:
+            raise ValueError(f"Model '{model_name}' not found.")
+
+        executor = self.getExecutor()
+        self.pending = [(image_path, executor.submit(_analyzeInWorker, image_path, model_name, model_info,
+                                                     encode_images))
+                        for image_path in image_paths]
+        try:
+            for image_path, future in self.pending:
+                if future.cancelled():
+                    continue
+                try:
+                    result, timings = future.result()
+                except Exception as e:
+                    yield image_path, None, e
+                    continue
+                if timings is not None:
+                    self.stage_timer.addRecord(timings)
+                if result_manager is not None:
+                    _, text, predictions, bounding_boxes = result
+                    result_manager.addResult(image_path, model_name, text, predictions, bounding_boxes)
+                yield image_path, result, None
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        for _, future in self.pending:
+            future.cancel()
+        self.pending = []
+
+    def shutdown(self):
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,156 @@
+import os
+import sys
+import glob
+import argparse
+from ModelManager import ModelManager
+from ResultExporter import ResultExporter
+from StreamingExporter import StreamingExporter
+from ResultCache import ResultCache, getDetectionCacheDir
+from ResultDatabase import ResultDatabase
+from StageTimer import StageTimer
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.bmp')
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m BatchCli',
+        description='Analyze images without the graphical interface.'
+    )
+    parser.add_argument('inputs', nargs='+', help='Image folders, files or glob patterns')
+    parser.add_argument('-m', '--model', default='Default', help='Name of the model to use')
+    parser.add_argument('-o', '--output', required=True, help='Folder where the results are saved')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('-b', '--backend', default='keras', choices=['keras', 'tflite', 'onnx'],
+                        help='Inference backend, converted models are cached')
+    parser.add_argument('--working-scale', type=float,
+                        help='Shrink crops to at most this multiple of the model input before filtering')
+    parser.add_argument('--ocr-tile-size', type=int,
+                        help='Read pages larger than this many pixels in tiles, to bound the OCR memory')
+    parser.add_argument('--ocr-tile-overlap', type=int, default=256,
+                        help='Overlap between OCR tiles, larger than the biggest text box')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip the images already exported to the output folder by an interrupted run')
+    parser.add_argument('--database',
+                        help='Also store the results in this SQLite file, several runs can write to it at once')
+    parser.add_argument('--no-cache', action='store_true', help='Do not reuse or store cached results and OCR detections')
+    parser.add_argument('--timings', help='Write the per-stage timings of every image to this JSON file')
+    parser.add_argument('--trace', help='Write the per-stage timings in Chrome trace-event format to this file')
+    parser.add_argument('--default-model', default='Models/Default.keras', help='Path of the default model')
+    parser.add_argument('--default-classes', default='class_names.json', help='Classes JSON of the default model')
+    return parser.parse_args(argv)
+
+def collectImages(inputs):
+    image_paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            candidates = sorted(os.path.join(pattern, filename) for filename in os.listdir(pattern))
+        else:
+            candidates = sorted(glob.glob(pattern))
+        image_paths.extend(path for path in candidates
+                           if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    # Keep the first occurrence of images matched by several inputs
+    return list(dict.fromkeys(image_paths))
+
+def analyzeSequentially(model_manager, image_paths, model_name, result_cache, working_scale, backend,
+                        stage_timer=None, ocr_tile_size=None, ocr_tile_overlap=256, detection_cache=None):
+    from ImageAnalyzer import ImageAnalyzer
+    image_analyzer = ImageAnalyzer(model_manager, result_cache=result_cache, working_scale=working_scale,
+                                   backend=backend, stage_timer=stage_timer, ocr_tile_size=ocr_tile_size,
+                                   ocr_tile_overlap=ocr_tile_overlap, detection_cache=detection_cache)
+    image_analyzer.setModel(model_name)
+    for image_path in image_paths:
+        try:
+            result = image_analyzer.analyze(image_path)
+        except Exception as e:
+            yield image_path, None, e
+            continue
+        yield image_path, result, None
+
+def analyzeInParallel(model_manager, image_paths, model_name, result_cache, working_scale, backend, workers,
+                      stage_timer=None, ocr_tile_size=None, ocr_tile_overlap=256, detection_cache=None):
+    from BatchAnalyzer import BatchAnalyzer
+    # Convert once here rather than racing to convert in every worker
+    if backend != 'keras':
+        model_manager.convertModel(model_name, [backend])
+    batch_analyzer = BatchAnalyzer(model_manager, workers=workers, result_cache=result_cache,
+                                   working_scale=working_scale, backend=backend, stage_timer=stage_timer,
+                                   ocr_tile_size=ocr_tile_size, ocr_tile_overlap=ocr_tile_overlap,
+                                   detection_cache=detection_cache)
+    try:
+        yield from batch_analyzer.analyze(image_paths, model_name, encode_images=True)
+    finally:
+        batch_analyzer.shutdown()
+
+def main(argv=None):
+    args = parseArguments(sys.argv[1:] if argv is None else argv)
+
+    model_manager = ModelManager(args.default_model, args.default_classes)
+    if model_manager.getModel(args.model) is None:
+        print(f"Model '{args.model}' not found. Available models: {', '.join(model_manager.getModelNames())}")
+        return 2
+
+    image_paths = collectImages(args.inputs)
+    if not image_paths:
+        print("No images found.")
+        return 1
+
+    result_cache = None if args.no_cache else ResultCache()
+    detection_cache = None if args.no_cache else ResultCache(getDetectionCacheDir())
+    stage_timer = StageTimer()
+    # Results are written while the next images are analyzed, nothing is kept until the end
+    exporter = StreamingExporter(ResultExporter(model_manager, stage_timer), args.output, resume=args.resume)
+    remaining_paths = [image_path for image_path in image_paths if not exporter.isExported(image_path)]
+    if len(remaining_paths) < len(image_paths):
+        print(f"Resuming: {len(image_paths) - len(remaining_paths)} images already exported.")
+    result_database = None
+    if args.database:
+        result_database = ResultDatabase(args.database)
+        result_database.startRun(args.model, {'backend': args.backend, 'working_scale': args.working_scale})
+
+    if args.workers > 1:
+        results = analyzeInParallel(model_manager, remaining_paths, args.model, result_cache, args.working_scale,
+                                    args.backend, args.workers, stage_timer, args.ocr_tile_size,
+                                    args.ocr_tile_overlap, detection_cache)
+    else:
+        results = analyzeSequentially(model_manager, remaining_paths, args.model, result_cache,
+                                      args.working_scale, args.backend, stage_timer, args.ocr_tile_size,
+                                      args.ocr_tile_overlap, detection_cache)
+
+    total_images = len(remaining_paths)
+    successful_analyses = 0
+    try:
+        for i, (image_path, result, error) in enumerate(results, 1):
+            if error is not None:
+                print(f"[{i}/{total_images}] Error analyzing image {image_path}: {error}")
+                continue
+            annotated_image, text, predictions, bounding_boxes = result
+            if result_database is not None:
+                result_database.addResult(image_path, args.model, text, predictions, bounding_boxes)
+            exporter.submit(image_path, {
+                'model': args.model,
+                'text': text,
+                'predictions': predictions,
+                'bounding_boxes': bounding_boxes
+            }, annotated_image)
+            successful_analyses += 1
+            print(f"[{i}/{total_images}] Analyzed {image_path}")
+    finally:
+        exporter.close()
+        if result_database is not None:
+            result_database.close()
+
+    successful_analyses -= len(exporter.errors)
+    print(f"Analysis complete. Successfully analyzed {successful_analyses}/{total_images} images.")
+    print(f"Results saved to {args.output}")
+
+    print(stage_timer.formatSummary())
+    if args.timings:
+        stage_timer.dumpJson(args.timings)
+        print(f"Timings saved to {args.timings}")
+    if args.trace:
+        stage_timer.dumpTrace(args.trace)
+        print(f"Trace saved to {args.trace}")
+    return 0 if successful_analyses == total_images else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import cv2
+
+# Printed text uses a plain font, handwritten text a script font with jitter
+FONTS = {
+    'printed': cv2.FONT_HERSHEY_SIMPLEX,
+    'handwritten': cv2.FONT_HERSHEY_SCRIPT_SIMPLEX
+}
+WORDS = ['fattura', 'totale', 'data', 'firma', 'importo', 'cliente', 'codice', 'numero', 'via', 'Roma',
+         'euro', 'pagamento', 'scadenza', 'ordine', 'quantita', 'prezzo', 'nome', 'cognome']
+
+def drawWord(image, word, origin, label, scale, rng):
+    font = FONTS[label]
+    thickness = 2 if label == 'printed' else int(rng.integers(1, 3))
+    if label == 'handwritten':
+        # Letters drawn one by one with a random vertical offset
+        x, y = origin
+        for letter in word:
+            offset = int(rng.integers(-3, 4))
+            cv2.putText(image, letter, (x, y + offset), font, scale, (20, 20, 20), thickness, cv2.LINE_AA)
+            x += cv2.getTextSize(letter, font, scale, thickness)[0][0]
+    else:
+        cv2.putText(image, word, origin, font, scale, (20, 20, 20), thickness, cv2.LINE_AA)
+    (width, height), baseline = cv2.getTextSize(word, font, scale, thickness)
+    tl = (origin[0] - 2, origin[1] - height - 4)
+    br = (origin[0] + width + 2, origin[1] + baseline + 4)
+    return tl, br
+
+def addNoise(image, rng):
+    noise = rng.normal(0, 8, image.shape)
+    return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+def generatePage(rng, width=1240, height=1754, lines=30):
+    # A4 page at 150 DPI with one labelled box per word
+    page = np.full((height, width, 3), 245, np.uint8)
+    boxes = []
+    labels = []
+    line_height = (height - 100) // lines
+    for line in range(lines):
+        x = 60
+        y = 80 + line * line_height
+        label = 'handwritten' if rng.random() < 0.4 else 'printed'
+        scale = float(rng.uniform(0.7, 1.2))
+        while True:
+            word = WORDS[int(rng.integers(len(WORDS)))]
+            width_needed = cv2.getTextSize(word, FONTS[label], scale, 2)[0][0]
+            if x + width_needed > width - 60:
+                break
+            tl, br = drawWord(page, word, (x, y), label, scale, rng)
+            boxes.append((tl, br))
+            labels.append(label)
+            x = br[0] + int(rng.integers(15, 40))
+    return addNoise(page, rng), boxes, labels
+
+def generateCrops(count, seed=0, heading_share=0.2):
+    # Body text crops, plus a share of heading-sized ones several hundred pixels wide,
+    # large enough to be shrunk by the working scale of the preprocessing
+    rng = np.random.default_rng(seed)
+    crops = []
+    labels = []
+    for _ in range(count):
+        label = 'handwritten' if rng.random() < 0.5 else 'printed'
+        if rng.random() < heading_share:
+            scale = float(rng.uniform(4.0, 8.0))
+        else:
+            scale = float(rng.uniform(0.6, 1.6))
+        word = WORDS[int(rng.integers(len(WORDS)))]
+        (width, height), baseline = cv2.getTextSize(word, FONTS[label], scale, 2)
+        crop = np.full((height + baseline + 16, width + 20, 3), 245, np.uint8)
+        drawWord(crop, word, (10, height + 8), label, scale, rng)
+        crops.append(addNoise(crop, rng))
+        labels.append(label)
+    return crops, labels
+
+def writePages(folder, count, seed=0):
+    # Pages are regenerated only when missing, the seed makes them reproducible
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    fixtures = []
+    for i in range(count):
+        page, boxes, labels = generatePage(rng)
+        path = os.path.join(folder, f"page_{seed}_{i:03d}.png")
+        if not os.path.exists(path):
+            cv2.imwrite(path, page)
+        fixtures.append((path, boxes, labels))
+    return fixtures
+
+def buildTinyModel(path, class_names=('handwritten', 'printed'), seed=0):
+    # Small classifier with the same (64, 64) input as the real models, built once and reused
+    if os.path.exists(path):
+        return path
+    import tensorflow as tf
+    tf.keras.utils.set_random_seed(seed)
+    model = tf.keras.Sequential([
+        tf.keras.Input((64, 64)),
+        tf.keras.layers.Rescaling(1.0 / 255),
+        tf.keras.layers.Reshape((64, 64, 1)),
+        tf.keras.layers.Conv2D(8, 3, activation='relu'),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Conv2D(16, 3, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(len(class_names), activation='softmax')
+    ])
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    model.save(path)
+    return path
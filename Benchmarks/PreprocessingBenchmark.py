@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+from Preprocessing import ImagePreprocessor, PREPROCESSING_PROFILES
+from DefaultSegmentation import DefaultSegmentation
+from Benchmarks.Fixtures import generateCrops
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.bmp')
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m Benchmarks.PreprocessingBenchmark',
+        description='Compare latency and accuracy of the preprocessing profiles on a set of crops.'
+    )
+    parser.add_argument('fixtures', nargs='?',
+                        help='Folder of text crops, optionally split in one subfolder per class, '
+                             'synthetic labelled crops are generated when omitted')
+    parser.add_argument('-n', '--crops', type=int, default=500, help='Number of synthetic crops')
+    parser.add_argument('-m', '--model', help='Model used to measure accuracy, latency only when omitted')
+    parser.add_argument('-p', '--profiles', nargs='+', default=list(PREPROCESSING_PROFILES),
+                        choices=list(PREPROCESSING_PROFILES), help='Profiles to compare')
+    parser.add_argument('-s', '--working-scale', type=float,
+                        help='Also run every profile with this bounded working scale and check it stays within tolerance')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.05,
+                        help='Maximum mean fraction of segmented pixels allowed to differ with the working scale')
+    parser.add_argument('-r', '--repeats', type=int, default=3, help='Timed passes per profile, the best one is kept')
+    parser.add_argument('--default-model', default='Models/Default.keras', help='Path of the default model')
+    parser.add_argument('--default-classes', default='class_names.json', help='Classes JSON of the default model')
+    return parser.parse_args(argv)
+
+def loadFixtures(folder):
+    # Crops in a subfolder are labelled with the subfolder name
+    fixtures = []
+    for root, _, filenames in sorted(os.walk(folder)):
+        label = None if os.path.samefile(root, folder) else os.path.basename(root)
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                crop = cv2.imread(os.path.join(root, filename))
+                if crop is not None:
+                    fixtures.append((crop, label))
+    return fixtures
+
+def preprocessAll(profile, crops, repeats, working_scale=None):
+    preprocessor = ImagePreprocessor(target_size=(64, 64), profile=profile, working_scale=working_scale)
+    segmentator = DefaultSegmentation()
+    best_time = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        batch = np.stack([segmentator.segment(preprocessor.preprocess(crop)) for crop in crops], axis=0)
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return batch, best_time
+
+def loadAnalyzer(args):
+    from ModelManager import ModelManager
+    from ImageAnalyzer import ImageAnalyzer
+    model_manager = ModelManager(args.default_model, args.default_classes)
+    image_analyzer = ImageAnalyzer(model_manager)
+    image_analyzer.setModel(args.model)
+    return image_analyzer
+
+def main(argv=None):
+    args = parseArguments(sys.argv[1:] if argv is None else argv)
+    if args.fixtures:
+        fixtures = loadFixtures(args.fixtures)
+    else:
+        fixtures = list(zip(*generateCrops(args.crops)))
+    if not fixtures:
+        print("No crops found.")
+        return 1
+    crops = [crop for crop, _ in fixtures]
+    labels = [label for _, label in fixtures]
+    image_analyzer = loadAnalyzer(args) if args.model else None
+
+    rows = []
+    reference_labels = None
+    for profile in args.profiles:
+        batch, elapsed = preprocessAll(profile, crops, args.repeats)
+        row = {'profile': profile, 'ms_per_crop': elapsed * 1000 / len(crops), 'crops_per_second': len(crops) / elapsed}
+        if image_analyzer is not None:
+            scores = image_analyzer.predictBatch(batch)
+            predicted = [image_analyzer.class_names[index] for index in np.argmax(scores, axis=1)]
+            labelled = [(p, l) for p, l in zip(predicted, labels) if l is not None]
+            row['accuracy'] = sum(p == l for p, l in labelled) / len(labelled) if labelled else None
+            # The first profile is the reference the others are compared to
+            if reference_labels is None:
+                reference_labels = predicted
+            row['agreement'] = sum(p == r for p, r in zip(predicted, reference_labels)) / len(predicted)
+        rows.append(row)
+
+        if args.working_scale is not None:
+            scaled_batch, scaled_elapsed = preprocessAll(profile, crops, args.repeats, args.working_scale)
+            # Fraction of segmented pixels that differ from the native resolution pipeline, per crop
+            differences = np.mean(scaled_batch != batch, axis=(1, 2))
+            rows.append({
+                'profile': f"{profile}@{args.working_scale:g}",
+                'ms_per_crop': scaled_elapsed * 1000 / len(crops),
+                'crops_per_second': len(crops) / scaled_elapsed,
+                'difference': float(np.mean(differences)),
+                'worst_difference': float(np.max(differences))
+            })
+
+    reference_time = rows[0]['ms_per_crop']
+    print(f"{len(crops)} crops, reference profile '{rows[0]['profile']}'")
+    for row in rows:
+        line = (f"{row['profile']:<10} {row['ms_per_crop']:8.3f} ms/crop {row['crops_per_second']:9.1f} crops/s "
+                f"x{reference_time / row['ms_per_crop']:.2f}")
+        if 'agreement' in row:
+            accuracy = 'n/a' if row['accuracy'] is None else f"{row['accuracy']:.3f}"
+            line += f"  accuracy {accuracy}  agreement {row['agreement']:.3f}"
+        if 'difference' in row:
+            line += f"  pixel difference mean {row['difference']:.3f} max {row['worst_difference']:.3f}"
+        print(line)
+
+    failing = [row['profile'] for row in rows if row.get('difference', 0) > args.tolerance]
+    if failing:
+        print(f"Outside tolerance {args.tolerance}: {', '.join(failing)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+
+# CPU-only and quiet TensorFlow, set before anything imports it
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import numpy as np
+import cv2
+from Benchmarks.Fixtures import writePages, buildTinyModel
+from Preprocessing import ImagePreprocessor, PREPROCESSING_PROFILES
+from DefaultSegmentation import DefaultSegmentation
+
+STAGES = ['decode', 'ocr', 'crop', 'preprocess', 'segment', 'inference', 'end_to_end']
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m Benchmarks.RunBenchmarks',
+        description='Time every stage of the analysis pipeline on synthetic pages.'
+    )
+    parser.add_argument('--pages', type=int, default=5, help='Number of synthetic pages')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per stage, the best one is kept')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES, help='Stages to run')
+    parser.add_argument('--profiles', nargs='+', default=list(PREPROCESSING_PROFILES),
+                        choices=list(PREPROCESSING_PROFILES), help='Preprocessing profiles to time')
+    parser.add_argument('--backends', nargs='+', default=['keras', 'tflite'], choices=['keras', 'tflite', 'onnx'],
+                        help='Inference backends to time')
+    parser.add_argument('--work-dir', default=os.path.join('Benchmarks', '.work'),
+                        help='Folder for the generated pages and the tiny model')
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('-c', '--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10,
+                        help='Allowed slowdown against the baseline before a stage counts as a regression')
+    return parser.parse_args(argv)
+
+def readProcessStatus(field):
+    # Memory fields of /proc/self/status are in kilobytes, None where there is no procfs
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def resetPeakRss():
+    # Writing 5 to clear_refs resets the peak RSS of the process to its current RSS (Linux only)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def getPeakRss():
+    peak = readProcessStatus('VmHWM')
+    # ru_maxrss is in kilobytes on Linux
+    return peak if peak is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def getCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timeBest(function, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def measureStage(function, repeats, images, boxes):
+    # Best time of the stage and the memory it adds to what the process already holds. Without
+    # clear_refs the peak cannot be reset, and only growth past the earlier peak is seen.
+    if resetPeakRss():
+        start_rss = readProcessStatus('VmRSS')
+    else:
+        start_rss = getPeakRss()
+    seconds = timeBest(function, repeats)
+    peak_rss = getPeakRss()
+    return {
+        'seconds': seconds,
+        'images_per_second': images / seconds if seconds else None,
+        'boxes_per_second': boxes / seconds if seconds else None,
+        'peak_rss_bytes': peak_rss,
+        'rss_growth_bytes': max(0, peak_rss - start_rss)
+    }
+
+def loadOcrReader(user_home):
+    # Only weights already on disk are used, the benchmark never downloads. They are looked up in
+    # the real home, HOME points at the temporary app directory while the benchmark runs.
+    module_path = os.environ.get('EASYOCR_MODULE_PATH', os.path.join(user_home, '.EasyOCR'))
+    try:
+        import easyocr
+        return easyocr.Reader(['it'], gpu=False, download_enabled=False, verbose=False,
+                              model_storage_directory=os.path.join(module_path, 'model'))
+    except Exception as e:
+        print(f"OCR stages skipped: {e}")
+        return None
+
+def createModelManager(work_dir):
+    from ModelManager import ModelManager
+    model_path = buildTinyModel(os.path.join(work_dir, 'tiny.keras'))
+    classes_path = os.path.join(work_dir, 'tiny_classes.json')
+    with open(classes_path, 'w') as f:
+        json.dump({'default': ['handwritten', 'printed']}, f)
+    return ModelManager(model_path, classes_path)
+
+def runBenchmarks(args, user_home):
+    fixtures = writePages(os.path.join(args.work_dir, 'pages'), args.pages)
+    pages = [cv2.imread(path) for path, _, _ in fixtures]
+    boxes = [page_boxes for _, page_boxes, _ in fixtures]
+    images = len(fixtures)
+    total_boxes = sum(len(page_boxes) for page_boxes in boxes)
+    results = {}
+
+    from ImageAnalyzer import ImageAnalyzer
+    model_manager = createModelManager(args.work_dir)
+    image_analyzer = ImageAnalyzer(model_manager)
+
+    if 'decode' in args.stages:
+        results['decode'] = measureStage(lambda: [cv2.imread(path) for path, _, _ in fixtures], args.repeats,
+                                         images, total_boxes)
+
+    reader = loadOcrReader(user_home) if {'ocr', 'end_to_end'} & set(args.stages) else None
+    if reader is not None:
+        image_analyzer.box_drawer.reader = reader
+    if 'ocr' in args.stages and reader is not None:
+        results['ocr'] = measureStage(lambda: [image_analyzer.box_drawer.readText(page) for page in pages],
+                                      args.repeats, images, total_boxes)
+
+    crops = [image_analyzer.extractCrops(page, page_boxes)[1] for page, page_boxes in zip(pages, boxes)]
+    if 'crop' in args.stages:
+        results['crop'] = measureStage(lambda: [image_analyzer.extractCrops(page, page_boxes)
+                                                for page, page_boxes in zip(pages, boxes)], args.repeats,
+                                       images, total_boxes)
+
+    if 'preprocess' in args.stages:
+        for profile in args.profiles:
+            preprocessor = ImagePreprocessor(target_size=(64, 64), profile=profile)
+            results[f"preprocess_{profile}"] = measureStage(
+                lambda: [preprocessor.preprocessBatch(page_crops) for page_crops in crops], args.repeats,
+                images, total_boxes)
+
+    # Later stages work on the output of the default profile
+    preprocessor = ImagePreprocessor(target_size=(64, 64))
+    batches = [preprocessor.preprocessBatch(page_crops) for page_crops in crops]
+    segmentator = DefaultSegmentation()
+    segmented = [segmentator.segmentBatch(batch) for batch in batches]
+    if 'segment' in args.stages:
+        results['segment'] = measureStage(lambda: [segmentator.segmentBatch(batch) for batch in batches],
+                                          args.repeats, images, total_boxes)
+
+    if 'inference' in args.stages:
+        from InferenceBackends import loadBackend
+        for backend_name in args.backends:
+            try:
+                backend = loadBackend(model_manager.getBackendPath('Default', backend_name))
+            except Exception as e:
+                print(f"Backend {backend_name} skipped: {e}")
+                continue
+            inputs = [batch.astype(np.float32) for batch in segmented]
+            backend.predict(inputs[0])
+            results[f"inference_{backend_name}"] = measureStage(
+                lambda: [backend.predict(batch) for batch in inputs], args.repeats, images, total_boxes)
+
+    if 'end_to_end' in args.stages:
+        image_analyzer.setModel('Default')
+        if reader is not None:
+            def analyzeAll():
+                # Drop memoized OCR so every run pays the full pipeline
+                image_analyzer.box_drawer.ocr_cache.clear()
+                for path, _, _ in fixtures:
+                    image_analyzer.analyze(path)
+            results['end_to_end'] = measureStage(analyzeAll, args.repeats, images, total_boxes)
+        else:
+            # Without OCR weights the known fixture boxes stand in for the detector
+            def analyzeWithoutOcr():
+                for (path, page_boxes, _) in fixtures:
+                    page = cv2.imread(path)
+                    _, page_crops = image_analyzer.extractCrops(page, page_boxes)
+                    batch = image_analyzer.segmentator.segmentBatch(
+                        image_analyzer.preprocessor.preprocessBatch(page_crops))
+                    image_analyzer.predictBatch(batch)
+                    image_analyzer.box_drawer.drawBoxes(page, page_boxes)
+            results['end_to_end_without_ocr'] = measureStage(analyzeWithoutOcr, args.repeats, images,
+                                                             total_boxes)
+
+    return {
+        'commit': getCommit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'pages': images,
+        'boxes': total_boxes,
+        'repeats': args.repeats,
+        'peak_rss_bytes': max([result['peak_rss_bytes'] for result in results.values()] + [getPeakRss()]),
+        'stages': results
+    }
+
+def compareResults(current, baseline, threshold):
+    regressions = []
+    print(f"Compared with {baseline.get('commit') or 'baseline'} (threshold {threshold:.0%})")
+    for stage, result in current['stages'].items():
+        reference = baseline.get('stages', {}).get(stage)
+        if reference is None:
+            continue
+        ratio = result['seconds'] / reference['seconds']
+        status = 'REGRESSION' if ratio > 1 + threshold else 'ok'
+        print(f"  {stage:<28} {reference['seconds']:9.4f}s -> {result['seconds']:9.4f}s  x{ratio:.2f}  {status}")
+        if status != 'ok':
+            regressions.append(stage)
+    return regressions
+
+def main(argv=None):
+    args = parseArguments(sys.argv[1:] if argv is None else argv)
+    # The app keeps its models, caches and converted files under ~/.image_analysis_app,
+    # the benchmark uses a throwaway home so it never touches the real one
+    user_home = os.path.expanduser('~')
+    with tempfile.TemporaryDirectory(prefix='benchmark_home_') as app_home:
+        os.environ['HOME'] = app_home
+        try:
+            report = runBenchmarks(args, user_home)
+        finally:
+            os.environ['HOME'] = user_home
+
+    print(f"{report['pages']} pages, {report['boxes']} boxes, best of {report['repeats']}")
+    for stage, result in report['stages'].items():
+        print(f"  {stage:<28} {result['seconds']:9.4f}s  {result['images_per_second']:9.2f} images/s  "
+              f"{result['boxes_per_second']:10.1f} boxes/s  "
+              f"RSS +{result['rss_growth_bytes'] / 2**20:.0f} MB (peak {result['peak_rss_bytes'] / 2**20:.0f} MB)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compareResults(report, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
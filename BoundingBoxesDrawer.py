@@ -1,31 +1,218 @@
-import easyocr
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import cv2
 
+def getBoxPredictions(predictions):
+    # Predictions keyed by box number. Boxes whose crop was empty have no prediction, so the
+    # position in the list is only used for old results saved without box numbers.
+    return {prediction.get('box', i): prediction for i, prediction in enumerate(predictions or [], 1)}
+
+def drawLabelledBoxes(image, bounding_boxes, predictions=None, scale=1.0):
+    # The one routine drawing results, for the analysis, the exports and the result view.
+    # scale maps the box coordinates onto a reduced copy of the image
+    box_predictions = getBoxPredictions(predictions)
+    for i, bbox in enumerate(bounding_boxes, 1):
+        tl, br = [(int(x * scale), int(y * scale)) for x, y in bbox]
+        cv2.rectangle(image, tl, br, (0, 255, 0), 2)
+        label = f"Box {i}: {box_predictions[i]['label']}" if i in box_predictions else f"Box {i}"
+        cv2.putText(image, label, (tl[0], tl[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+    return image
+
 class BoundingBoxesDrawer:
-    def __init__(self):
-        self.reader = easyocr.Reader(['it'], gpu=False)
+    def __init__(self, max_cached_images=256, tile_size=None, tile_overlap=256, tile_workers=2,
+                 iou_threshold=0.5, containment_threshold=0.8, detection_cache=None):
+        # The easyocr reader loads detector and recognizer weights, so it is
+        # only built when the first image is analyzed (or by warmUp)
+        self.reader = None
+        self.reader_lock = threading.Lock()
+        # Pages larger than tile_size are read in overlapping tiles, which bounds the detector
+        # memory. The overlap must exceed the largest text box. tile_workers tiles are read at
+        # once and share the torch threads, more of them only multiplies the detector memory.
+        if tile_size is not None and tile_overlap >= tile_size:
+            raise ValueError("The tile overlap must be smaller than the tile size.")
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_workers = max(1, tile_workers)
+        self.iou_threshold = iou_threshold
+        self.containment_threshold = containment_threshold
+        # OCR output only depends on the image, so it is reused across models
+        self.max_cached_images = max_cached_images
+        self.ocr_cache = OrderedDict()
+        self.ocr_cache_lock = threading.Lock()
+        # Optional ResultCache on disk keyed by the image content, shared by the batch worker
+        # processes and kept across sessions
+        self.detection_cache = detection_cache
+
+    def getReader(self):
+        with self.reader_lock:
+            if self.reader is None:
+                import easyocr
+                self.reader = easyocr.Reader(['it'], gpu=False)
+            return self.reader
+
+    def getParameters(self):
+        # Everything that changes the boxes, used in result cache keys
+        return {'tile_size': self.tile_size, 'tile_overlap': self.tile_overlap}
+
+    def getCacheKey(self, image_path):
+        stat = os.stat(image_path)
+        return (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+
+    def findBoundingBoxes(self, image_path, image=None):
+        # An already decoded BGR image can be passed to avoid reading the file again
+        if image is None:
+            image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not read image {image_path}")
+
+        cache_key = self.getCacheKey(image_path)
+        with self.ocr_cache_lock:
+            cached = self.ocr_cache.get(cache_key)
+            if cached is not None:
+                self.ocr_cache.move_to_end(cache_key)
+        if cached is not None:
+            text, bounding_boxes = cached
+            return image, text, list(bounding_boxes)
 
-    def findBoundingBoxes(self, image_path):
-        image = cv2.imread(image_path)
-        result = self.reader.readtext(image_path)
+        text, bounding_boxes = self.readDetections(image_path, image)
+
+        with self.ocr_cache_lock:
+            self.ocr_cache[cache_key] = (text, bounding_boxes)
+            while len(self.ocr_cache) > self.max_cached_images:
+                self.ocr_cache.popitem(last=False)
+
+        return image, text, list(bounding_boxes)
+
+    def readDetections(self, image_path, image):
+        if self.detection_cache is None:
+            return self.readText(image)
+        key = self.detection_cache.getImageKey(image_path, self.getParameters())
+        entry = self.detection_cache.get(key)
+        if entry is not None:
+            return entry['text'], entry['bounding_boxes']
+        text, bounding_boxes = self.readText(image)
+        self.detection_cache.putEntry(key, {'text': text, 'bounding_boxes': bounding_boxes})
+        return text, bounding_boxes
+
+    def readText(self, image):
+        if self.tile_size is not None and max(image.shape[:2]) > self.tile_size:
+            height, width = image.shape[:2]
+            if len(self.getTileSpans(height)) * len(self.getTileSpans(width)) > 1:
+                return self.readTextTiled(image)
 
         # Initialize the list to store extracted text and bounding boxes
         total_text = []
         bounding_boxes = []
 
-        for (bbox, text, prob) in result:
+        for tl, br, text, _ in self.readRegion(image):
             total_text.append(text)
-            (tl, tr, br, bl) = bbox
-            tl = (int(tl[0]), int(tl[1]))
-            br = (int(br[0]), int(br[1]))
-
             # Store bounding boxes
             bounding_boxes.append((tl, br))
 
-        return image, ' '.join(total_text), bounding_boxes
-    
-    def drawBoxes(self, image, bounding_boxes):
-        for i, (tl, br) in enumerate(bounding_boxes, 1):
-            cv2.rectangle(image, tl, br, (0, 255, 0), 2)
-            cv2.putText(image, f"Box {i}", (tl[0], tl[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-        return image
\ No newline at end of file
+        return ' '.join(total_text), bounding_boxes
+
+    def readRegion(self, image, x_offset=0, y_offset=0):
+        # Same steps as easyocr's readtext on a file: detection on the RGB image,
+        # recognition on the grayscale one, without decoding the file again.
+        # Returns (tl, br, text, confidence) with the boxes moved by the offsets.
+        reader = self.getReader()
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        horizontal_list, free_list = reader.detect(rgb)
+        result = reader.recognize(gray, horizontal_list[0], free_list[0])
+
+        entries = []
+        for (bbox, text, prob) in result:
+            (tl, tr, br, bl) = bbox
+            tl = (int(tl[0]) + x_offset, int(tl[1]) + y_offset)
+            br = (int(br[0]) + x_offset, int(br[1]) + y_offset)
+            entries.append((tl, br, text, float(prob)))
+        return entries
+
+    def getTileSpans(self, length):
+        # (start, end) of the tiles along one side, stepping by tile_size - overlap. A remainder
+        # shorter than the overlap is added to the last tile instead of being read on its own.
+        stride = self.tile_size - self.tile_overlap
+        spans = []
+        start = 0
+        while start + self.tile_size + self.tile_overlap <= length:
+            spans.append((start, start + self.tile_size))
+            start += stride
+        spans.append((start, length))
+        return spans
+
+    def readTextTiled(self, image):
+        height, width = image.shape[:2]
+        # Tiles are views into the page
+        tiles = [
+            (image[y_start:y_end, x_start:x_end], x_start, y_start)
+            for y_start, y_end in self.getTileSpans(height)
+            for x_start, x_end in self.getTileSpans(width)
+        ]
+        workers = min(self.tile_workers, len(tiles))
+        if workers == 1:
+            entries = [entry for tile in tiles for entry in self.readRegion(*tile)]
+        else:
+            # torch already spreads one tile over every core, the concurrent tiles split its threads
+            self.getReader()
+            import torch
+            torch_threads = torch.get_num_threads()
+            torch.set_num_threads(max(1, torch_threads // workers))
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    entries = [entry for tile_entries in executor.map(lambda tile: self.readRegion(*tile), tiles)
+                               for entry in tile_entries]
+            finally:
+                torch.set_num_threads(torch_threads)
+        entries = self.sortReadingOrder(self.mergeEntries(entries))
+        return ' '.join(text for _, _, text, _ in entries), [(tl, br) for tl, br, _, _ in entries]
+
+    def mergeEntries(self, entries):
+        # Words on a seam are read by several tiles, whole or cut. Boxes overlapping a kept
+        # box, or lying mostly inside it, are dropped; larger and more confident boxes win.
+        if not entries:
+            return entries
+        boxes = np.array([(tl[0], tl[1], br[0], br[1]) for tl, br, _, _ in entries], dtype=np.float64)
+        areas = np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+        confidences = np.array([entry[3] for entry in entries])
+        order = np.lexsort((-confidences, -areas))
+
+        kept = []
+        for i in order:
+            if kept:
+                others = boxes[kept]
+                width = np.minimum(others[:, 2], boxes[i, 2]) - np.maximum(others[:, 0], boxes[i, 0])
+                height = np.minimum(others[:, 3], boxes[i, 3]) - np.maximum(others[:, 1], boxes[i, 1])
+                intersection = np.maximum(width, 0) * np.maximum(height, 0)
+                union = areas[kept] + areas[i] - intersection
+                iou = intersection / np.maximum(union, 1)
+                containment = intersection / max(areas[i], 1)
+                if np.any(iou > self.iou_threshold) or np.any(containment > self.containment_threshold):
+                    continue
+            kept.append(i)
+        return [entries[i] for i in kept]
+
+    def sortReadingOrder(self, entries):
+        # Lines are formed by the vertical centers, a box more than half a median box height
+        # below the first box of the line starts a new one; each line is read left to right
+        if not entries:
+            return entries
+        heights = [br[1] - tl[1] for tl, br, _, _ in entries]
+        line_gap = max(float(np.median(heights)) / 2, 1)
+        entries = sorted(entries, key=lambda entry: (entry[0][1] + entry[1][1]) / 2)
+
+        lines = []
+        line_center = None
+        for entry in entries:
+            center = (entry[0][1] + entry[1][1]) / 2
+            if line_center is None or center - line_center > line_gap:
+                lines.append([])
+                line_center = center
+            lines[-1].append(entry)
+        return [entry for line in lines for entry in sorted(line, key=lambda entry: entry[0][0])]
+
+    def drawBoxes(self, image, bounding_boxes, predictions=None, scale=1.0):
+        return drawLabelledBoxes(image, bounding_boxes, predictions, scale)
\ No newline at end of file
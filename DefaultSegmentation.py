@@ -4,8 +4,16 @@ from ISegmentation import ISegmentation
 
 class DefaultSegmentation(ISegmentation):
     def segment(self, image):
-        # Convert float image to uint8
-        image_uint8 = (image * 255).astype(np.uint8)
+        # Paths are still accepted, arrays are used as they are
+        if isinstance(image, str):
+            image_uint8 = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+            if image_uint8 is None:
+                raise ValueError(f"Could not read image {image}")
+        elif image.dtype == np.uint8:
+            image_uint8 = image
+        else:
+            # Convert float image to uint8
+            image_uint8 = (image * 255).astype(np.uint8)
 
         # Convert the image to grayscale if it's not already
         if len(image_uint8.shape) == 3:
@@ -16,4 +24,43 @@ class DefaultSegmentation(ISegmentation):
         # Apply thresholding
         _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
-        return binary
\ No newline at end of file
+        return binary
+
+    def segmentBatch(self, images):
+        # Same as segment on every image of an (N, H, W) batch, with Otsu's
+        # threshold computed for all the images at once
+        if images.dtype == np.uint8:
+            images_uint8 = images
+        else:
+            images_uint8 = (images * 255).astype(np.uint8)
+
+        thresholds = self.otsuThresholds(images_uint8)
+        return np.where(images_uint8 > thresholds[:, None, None], 0, 255).astype(np.uint8)
+
+    def otsuThresholds(self, images):
+        # Per-image histograms in a single bincount, one row of 256 bins per image
+        count = images.shape[0]
+        offsets = (np.arange(count, dtype=np.int64) * 256)[:, None]
+        flat = images.reshape(count, -1).astype(np.int64) + offsets
+        histograms = np.bincount(flat.ravel(), minlength=count * 256).reshape(count, 256)
+        probabilities = histograms / histograms.sum(axis=1, keepdims=True)
+
+        # Between-class variance for every candidate threshold, as in cv2.threshold
+        levels = np.arange(256)
+        q1 = np.cumsum(probabilities, axis=1)
+        q2 = 1.0 - q1
+        cumulative_mean = np.cumsum(probabilities * levels, axis=1)
+        mean = cumulative_mean[:, -1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mu1 = cumulative_mean / q1
+            mu2 = (mean - cumulative_mean) / q2
+            sigma = q1 * q2 * (mu1 - mu2) ** 2
+
+        epsilon = np.finfo(np.float32).eps
+        valid = (np.minimum(q1, q2) >= epsilon) & (np.maximum(q1, q2) <= 1.0 - epsilon)
+        sigma = np.where(valid, sigma, 0.0)
+
+        # First maximum wins, and uniform images keep a threshold of 0
+        thresholds = np.argmax(sigma, axis=1)
+        thresholds[sigma.max(axis=1) <= 0] = 0
+        return thresholds
@@ -0,0 +1,15 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+class IInferenceBackend(ABC):
+    @abstractmethod
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def getInputShape(self):
+        pass
+
+    @abstractmethod
+    def estimateSize(self) -> int:
+        pass
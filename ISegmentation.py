@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any
+import numpy as np
 import Image
 
 class ISegmentation(ABC):
     @abstractmethod
     def segment(self, image: Image) -> Image:
-        pass
\ No newline at end of file
+        pass
+
+    def segmentBatch(self, images):
+        # Segmentations can override this with a vectorized version
+        return np.stack([self.segment(image) for image in images], axis=0)
@@ -1,9 +1,22 @@
+import os
 import cv2
 
 class Image:
     def __init__(self, path):
+        # Only metadata is kept, pixels are decoded on demand
         self.path = path
-        self.data = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
-    
+        self.name = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+            self.file_size = stat.st_size
+            self.modified_time = stat.st_mtime_ns
+        except OSError:
+            self.file_size = None
+            self.modified_time = None
+
+    @property
+    def data(self):
+        return self.getData()
+
     def getData(self):
-        return self.data # Matrice di pixel
\ No newline at end of file
+        return cv2.imread(self.path, cv2.IMREAD_GRAYSCALE) # Matrice di pixel
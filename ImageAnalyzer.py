@@ -1,29 +1,69 @@
-import tensorflow as tf
+import functools
 import numpy as np
 import cv2
 from BoundingBoxesDrawer import BoundingBoxesDrawer
 from DefaultSegmentation import DefaultSegmentation
 from IModel import IModel
+from ModelCache import ModelCache
+from InferenceBackends import loadBackend
 from Preprocessing import ImagePreprocessor
+from StageTimer import StageTimer
 
 class ImageAnalyzer(IModel):
-    def __init__(self, model_manager):
+    def __init__(self, model_manager, max_batch_size=256, max_cached_models=3, max_cache_bytes=None,
+                 result_cache=None, working_scale=None, preprocess_workers=None, backend='keras', stage_timer=None,
+                 ocr_tile_size=None, ocr_tile_overlap=256, ocr_tile_workers=2, inference_threads=None,
+                 detection_cache=None):
         self.model_manager = model_manager
         self.model = None
+        self.model_name = None
+        self.model_path = None
+        self.result_cache = result_cache
+        self.backend = backend
         self.class_names = []
-        self.box_drawer = BoundingBoxesDrawer()
+        # The TFLite and ONNX interpreters use every core unless inference_threads is given
+        self.model_cache = ModelCache(functools.partial(loadBackend, threads=inference_threads),
+                                      max_cached_models, max_cache_bytes)
+        self.max_batch_size = max_batch_size
+        self.box_drawer = BoundingBoxesDrawer(tile_size=ocr_tile_size, tile_overlap=ocr_tile_overlap,
+                                              tile_workers=ocr_tile_workers, detection_cache=detection_cache)
         self.segmentator = DefaultSegmentation()
-        self.preprocessor = ImagePreprocessor(target_size=(64, 64))
+        self.preprocessor = ImagePreprocessor(target_size=(64, 64), working_scale=working_scale,
+                                              workers=preprocess_workers)
+        self.stage_timer = stage_timer or StageTimer()
 
     def setModel(self, model_name):
         model_info = self.model_manager.getModel(model_name)
         if model_info is None:
             raise ValueError(f"Model '{model_name}' not found.")
         
-        self.model = tf.keras.models.load_model(model_info['path'])
+        model_path = model_info['path']
+        if self.backend != 'keras':
+            try:
+                model_path = self.model_manager.getBackendPath(model_name, self.backend)
+            except Exception as e:
+                print(f"Backend '{self.backend}' unavailable for model '{model_name}', using Keras: {e}")
+
+        self.preprocessor.setProfile(model_info.get('preprocessing', 'quality'))
+        self.model = self.model_cache.get(model_name, model_path)
+        self.model_name = model_name
+        self.model_path = model_path
         self.class_names = model_info['classes']
         print(f"Model '{model_name}' loaded successfully with classes: {self.class_names}")
 
+    def warmUp(self):
+        # Pay the heavy imports and the OCR reader construction ahead of the first analysis
+        import tensorflow
+        self.box_drawer.getReader()
+
+    def forgetModel(self, model_name):
+        self.model_cache.remove(model_name)
+        if self.model_name == model_name:
+            self.model = None
+            self.model_name = None
+            self.model_path = None
+            self.class_names = []
+
     def preprocessImage(self, image):
         # Preprocess the image
         preprocessed = self.preprocessor.preprocess(image)
@@ -36,37 +76,143 @@ class ImageAnalyzer(IModel):
         
         return segmented
 
-    def analyze(self, image_path):
-        if self.model is None:
-            raise ValueError("Model has not been set.")
-
-        original_image, text, bounding_boxes = self.box_drawer.findBoundingBoxes(image_path)
+    def predictBatch(self, batch):
+        # Run the forward pass in chunks of at most max_batch_size to cap memory,
+        # always as float32 so the traced graph matches the warm-up call
+        batch = batch.astype(np.float32, copy=False)
+        outputs = []
+        for start in range(0, len(batch), self.max_batch_size):
+            chunk = batch[start:start + self.max_batch_size]
+            outputs.append(self.model.predict(chunk))
+        return np.concatenate(outputs, axis=0)
 
-        predictions = []
+    def extractCrops(self, original_image, bounding_boxes):
+        box_numbers = []
+        crops = []
         for i, (tl, br) in enumerate(bounding_boxes, 1):
             x_min, y_min = tl
             x_max, y_max = br
-            extracted_bb = original_image[y_min:y_max, x_min:x_max]
+            # Zero-copy view of the box inside the original image
+            extracted_bb = original_image[max(y_min, 0):y_max, max(x_min, 0):x_max]
             if extracted_bb.size == 0:
                 continue
             
-            # Save the extracted bounding box as a temporary image file
-            temp_bb_path = f"temp_bb_{i}.jpg"
-            cv2.imwrite(temp_bb_path, extracted_bb)
-            
-            # Process the temporary image file
-            processed_bb = self.preprocessImage(temp_bb_path)
-            
-            # Remove the temporary file
-            import os
-            os.remove(temp_bb_path)
-            
-            prediction = self.model.predict(processed_bb)
-            label_index = np.argmax(prediction, axis=1)[0]
-            label = self.class_names[label_index]
-            confidence = float(prediction[0][label_index])
-            predictions.append({"box": i, "label": label, "confidence": confidence})
+            crops.append(extracted_bb)
+            box_numbers.append(i)
+        return box_numbers, crops
+
+    def getSampleBatch(self, image_paths, model_name, max_samples=200, is_cancelled=None):
+        # Model inputs built from the boxes of real images, as seen by the given model
+        model_info = self.model_manager.getModel(model_name)
+        if model_info is None:
+            raise ValueError(f"Model '{model_name}' not found.")
+        preprocessor = ImagePreprocessor(self.preprocessor.target_size, model_info.get('preprocessing', 'quality'),
+                                         self.preprocessor.working_scale, self.preprocessor.workers)
+
+        samples = []
+        sample_count = 0
+        for image_path in image_paths:
+            if is_cancelled is not None and is_cancelled():
+                return None
+            original_image, _, bounding_boxes = self.box_drawer.findBoundingBoxes(image_path)
+            _, crops = self.extractCrops(original_image, bounding_boxes)
+            crops = crops[:max_samples - sample_count]
+            if crops:
+                samples.append(self.segmentator.segmentBatch(preprocessor.preprocessBatch(crops)))
+                sample_count += len(crops)
+            if sample_count >= max_samples:
+                break
+
+        if not samples:
+            raise ValueError("No text boxes found in the images.")
+        return np.concatenate(samples, axis=0).astype(np.float32)
+
+    def getCacheKey(self, image_path):
+        # The class names map the model outputs to labels, a model registered with other classes gets new results
+        parameters = dict(self.preprocessor.getParameters(), ocr=self.box_drawer.getParameters(),
+                          classes=list(self.class_names))
+        return self.result_cache.getKey(image_path, self.model_name, self.model_path, parameters)
+
+    def getLastTimings(self):
+        return self.stage_timer.getLastTimings()
+
+    def getTimingSummary(self):
+        return self.stage_timer.getSummary()
+
+    def analyze(self, image_path, image=None):
+        # Every call records a per-stage timing entry, also when the analysis fails
+        self.stage_timer.start(image_path)
+        try:
+            return self.runAnalysis(image_path, image)
+        finally:
+            self.stage_timer.finish()
+
+    def analyzeFile(self, image_path):
+        # Like analyze, also returning the original image, which is decoded inside the timed 'decode' stage
+        self.stage_timer.start(image_path)
+        try:
+            with self.stage_timer.stage('decode'):
+                original_image = cv2.imread(image_path)
+            if original_image is None:
+                raise ValueError(f"Could not read image {image_path}")
+            return (original_image,) + self.runAnalysis(image_path, original_image)
+        finally:
+            self.stage_timer.finish()
+
+    def runAnalysis(self, image_path, image=None):
+        # When the caller passes the decoded image it is shared with the OCR and
+        # cropping stages and left untouched, the boxes are drawn on a copy
+        if self.model is None:
+            raise ValueError("Model has not been set.")
+        timer = self.stage_timer
+
+        caller_image = image is not None
+        if image is None:
+            with timer.stage('decode'):
+                image = cv2.imread(image_path)
+            if image is None:
+                raise ValueError(f"Could not read image {image_path}")
+
+        cache_key = None
+        if self.result_cache is not None:
+            with timer.stage('cache'):
+                cache_key = self.getCacheKey(image_path)
+                cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                with timer.stage('draw'):
+                    original_image = image.copy() if caller_image else image
+                    annotated_image = self.box_drawer.drawBoxes(original_image, cached['bounding_boxes'],
+                                                                   cached['predictions'])
+                return annotated_image, cached['text'], cached['predictions'], cached['bounding_boxes']
+
+        with timer.stage('readtext'):
+            original_image, text, bounding_boxes = self.box_drawer.findBoundingBoxes(image_path, image)
+        with timer.stage('crop'):
+            box_numbers, crops = self.extractCrops(original_image, bounding_boxes)
+
+        predictions = []
+        if crops:
+            # Single (N, H, W) tensor for all the boxes of the image
+            with timer.stage('preprocess'):
+                batch = self.preprocessor.preprocessBatch(crops)
+            with timer.stage('segment'):
+                batch = self.segmentator.segmentBatch(batch)
+            with timer.stage('predict'):
+                scores = self.predictBatch(batch)
+            label_indices = np.argmax(scores, axis=1)
+            confidences = scores[np.arange(len(label_indices)), label_indices]
+            predictions = [
+                {"box": box, "label": self.class_names[label_index], "confidence": float(confidence)}
+                for box, label_index, confidence in zip(box_numbers, label_indices, confidences)
+            ]
+
+        if cache_key is not None:
+            with timer.stage('cache'):
+                self.result_cache.put(cache_key, text, predictions, bounding_boxes)
 
-        annotated_image = self.box_drawer.drawBoxes(original_image, bounding_boxes)
+        with timer.stage('draw'):
+            if caller_image:
+                original_image = original_image.copy()
+            annotated_image = self.box_drawer.drawBoxes(original_image, bounding_boxes, predictions)
 
-        return annotated_image, text, predictions, bounding_boxes
\ No newline at end of file
+        return annotated_image, text, predictions, bounding_boxes
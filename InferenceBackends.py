@@ -0,0 +1,99 @@
+import os
+import numpy as np
+from IInferenceBackend import IInferenceBackend
+
+class KerasBackend(IInferenceBackend):
+    def __init__(self, model_path):
+        # TensorFlow is imported on first use to keep application startup fast
+        import tensorflow as tf
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+    def getInputShape(self):
+        input_shape = self.model.input_shape
+        if isinstance(input_shape, list):
+            input_shape = input_shape[0]
+        return tuple(input_shape)
+
+    def estimateSize(self):
+        return self.model.count_params() * 4
+
+class TFLiteBackend(IInferenceBackend):
+    def __init__(self, model_path, threads=None):
+        import tensorflow as tf
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=threads or os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input_details['shape'][0])
+
+    def resizeBatch(self, batch_size):
+        # The interpreter is reallocated only when the batch size changes
+        if batch_size != self.batch_size:
+            shape = [batch_size] + list(self.input_details['shape'][1:])
+            self.interpreter.resize_tensor_input(self.input_details['index'], shape)
+            self.interpreter.allocate_tensors()
+            self.input_details = self.interpreter.get_input_details()[0]
+            self.output_details = self.interpreter.get_output_details()[0]
+            self.batch_size = batch_size
+
+    def predict(self, batch):
+        self.resizeBatch(len(batch))
+        batch = batch.reshape(self.input_details['shape'])
+
+        # Quantized models take integer inputs and return integer outputs
+        input_dtype = self.input_details['dtype']
+        if input_dtype != np.float32:
+            scale, zero_point = self.input_details['quantization']
+            info = np.iinfo(input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        self.interpreter.set_tensor(self.input_details['index'], batch.astype(input_dtype))
+        self.interpreter.invoke()
+
+        output = self.interpreter.get_tensor(self.output_details['index'])
+        if self.output_details['dtype'] != np.float32:
+            scale, zero_point = self.output_details['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    def getInputShape(self):
+        return tuple(int(dim) for dim in self.input_details['shape'])
+
+    def estimateSize(self):
+        return os.path.getsize(self.model_path)
+
+class OnnxBackend(IInferenceBackend):
+    def __init__(self, model_path, threads=None):
+        import onnxruntime
+        self.model_path = model_path
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input = self.session.get_inputs()[0]
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input.name: batch})[0]
+
+    def getInputShape(self):
+        return tuple(dim if isinstance(dim, int) else None for dim in self.input.shape)
+
+    def estimateSize(self):
+        return os.path.getsize(self.model_path)
+
+BACKEND_EXTENSIONS = {
+    '.tflite': TFLiteBackend,
+    '.onnx': OnnxBackend
+}
+
+def loadBackend(model_path, threads=None):
+    # The backend follows the file format, .keras and .h5 files are run by Keras.
+    # threads limits the interpreters, which otherwise use every core.
+    extension = os.path.splitext(model_path)[1].lower()
+    if extension in BACKEND_EXTENSIONS:
+        return BACKEND_EXTENSIONS[extension](model_path, threads)
+    return KerasBackend(model_path)
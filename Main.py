@@ -1,21 +1,66 @@
+import time
+_start_time = time.perf_counter()
+
 import sys
+import argparse
+import threading
+from pathlib import Path
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 from UserInterface import UserInterface
 from ModelManager import ModelManager
 from ImageAnalyzer import ImageAnalyzer
+from BatchAnalyzer import BatchAnalyzer
 from ResultManager import ResultManager
+from ResultDatabase import ResultDatabase
+from ResultCache import ResultCache, getDetectionCacheDir
+from ThumbnailCache import ThumbnailCache
+
+def logStartup(message):
+    print(f"[startup] {message}: {(time.perf_counter() - _start_time) * 1000:.0f} ms")
+
+def warmUpInBackground(image_analyzer):
+    def warmUp():
+        try:
+            image_analyzer.warmUp()
+            logStartup("Analyzer warmed up")
+        except Exception as e:
+            print(f"Analyzer warm-up failed: {e}")
+    threading.Thread(target=warmUp, daemon=True).start()
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Image analysis application.')
+    parser.add_argument('--database', help='SQLite file where the results are kept between sessions')
+    # The remaining arguments are left to Qt
+    return parser.parse_known_args(argv)
 
 def main():
-    app = QApplication(sys.argv)
+    logStartup("Modules imported")
+    args, qt_arguments = parseArguments(sys.argv[1:])
+    app = QApplication(sys.argv[:1] + qt_arguments)
     default_model = 'Models/Default.keras'
     default_classes = 'class_names.json'
     model_manager = ModelManager(default_model, default_classes)
-    result_manager = ResultManager()
-    image_analyzer = ImageAnalyzer(model_manager)
+    result_manager = ResultDatabase(args.database) if args.database else ResultManager()
+    result_cache = ResultCache()
+    detection_cache = ResultCache(getDetectionCacheDir())
+    image_analyzer = ImageAnalyzer(model_manager, result_cache=result_cache, detection_cache=detection_cache)
+    batch_analyzer = BatchAnalyzer(model_manager, result_cache=result_cache, detection_cache=detection_cache)
+
+    thumbnail_cache = ThumbnailCache(cache_dir=Path.home() / '.image_analysis_app' / 'thumbnails')
 
-    ui = UserInterface(model_manager, image_analyzer, result_manager)
+    ui = UserInterface(model_manager, image_analyzer, result_manager, batch_analyzer, thumbnail_cache)
     ui.show()
-    sys.exit(app.exec_())
+    logStartup("Window shown")
+    if args.database:
+        QTimer.singleShot(0, ui.restoreSession)
+    # Start warming up once the event loop has painted the window
+    QTimer.singleShot(0, lambda: warmUpInBackground(image_analyzer))
+    exit_code = app.exec_()
+    batch_analyzer.shutdown()
+    if args.database:
+        result_manager.close()
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import os
+from collections import OrderedDict
+import numpy as np
+
+class ModelCache:
+    def __init__(self, loader, max_models=3, max_bytes=None):
+        self.loader = loader
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+
+    def getKey(self, model_name, model_path):
+        return (model_name, os.path.abspath(model_path), os.path.getmtime(model_path))
+
+    def get(self, model_name, model_path):
+        key = self.getKey(model_name, model_path)
+        if key in self.entries:
+            # Mark as most recently used
+            self.entries.move_to_end(key)
+            return self.entries[key]['model']
+
+        model = self.loader(model_path)
+        self.warmUp(model)
+        self.entries[key] = {'model': model, 'size': self.estimateSize(model, model_path)}
+        self.evict()
+        return model
+
+    def warmUp(self, model):
+        # One dummy predict so the first real batch does not pay graph tracing
+        try:
+            input_shape = model.getInputShape()
+            dummy = np.zeros([1] + [dim or 1 for dim in input_shape[1:]], dtype=np.float32)
+            model.predict(dummy)
+        except Exception as e:
+            print(f"Model warm-up skipped: {e}")
+
+    def estimateSize(self, model, model_path):
+        try:
+            return model.estimateSize()
+        except Exception:
+            return os.path.getsize(model_path)
+
+    def totalSize(self):
+        return sum(entry['size'] for entry in self.entries.values())
+
+    def evict(self):
+        # Drop least recently used models until both budgets are respected,
+        # always keeping the model that was just loaded
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_models
+            or (self.max_bytes is not None and self.totalSize() > self.max_bytes)
+        ):
+            key, _ = self.entries.popitem(last=False)
+            print(f"Model '{key[0]}' evicted from cache.")
+
+    def remove(self, model_name):
+        for key in [key for key in self.entries if key[0] == model_name]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
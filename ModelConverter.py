@@ -0,0 +1,103 @@
+import os
+import importlib.util
+import tempfile
+from pathlib import Path
+import numpy as np
+from ResultCache import hashFile
+
+CONVERTED_EXTENSIONS = {
+    'tflite': '.tflite',
+    'onnx': '.onnx'
+}
+
+class ModelConverter:
+    def __init__(self, output_dir=None):
+        self.output_dir = Path(output_dir) if output_dir else Path.home() / '.image_analysis_app' / 'converted_models'
+
+    def getConvertedPath(self, model_path, backend):
+        # Converted files are named after the source model content, so they are reused
+        # for as long as the original file does not change
+        return self.output_dir / f"{hashFile(model_path)}{CONVERTED_EXTENSIONS[backend]}"
+
+    def convert(self, model_path, backend):
+        if backend == 'keras':
+            return model_path
+        if backend not in CONVERTED_EXTENSIONS:
+            raise ValueError(f"Unknown inference backend '{backend}'.")
+        if str(model_path).lower().endswith(CONVERTED_EXTENSIONS[backend]):
+            return model_path
+
+        converted_path = self.getConvertedPath(model_path, backend)
+        if not converted_path.exists():
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            # Convert to a unique temporary file and rename it, so concurrent conversions never clash
+            fd, temp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+            os.close(fd)
+            try:
+                if backend == 'tflite':
+                    self.convertToTFLite(model_path, temp_path)
+                else:
+                    self.convertToOnnx(model_path, temp_path)
+                os.replace(temp_path, converted_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            print(f"Model {model_path} converted to {backend}.")
+        return str(converted_path)
+
+    def convertToTFLite(self, model_path, output_path):
+        import tensorflow as tf
+        model = tf.keras.models.load_model(model_path)
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        with open(output_path, 'wb') as f:
+            f.write(converter.convert())
+
+    def convertToOnnx(self, model_path, output_path):
+        # tf2onnx is optional, the ONNX backend is only offered when it is installed
+        import tensorflow as tf
+        import tf2onnx
+        model = tf.keras.models.load_model(model_path)
+        tf2onnx.convert.from_keras(model, output_path=str(output_path))
+
+    def quantize(self, model_path, samples, output_path):
+        # Post-training full integer quantization, calibrated on the given model inputs
+        import tensorflow as tf
+        model = tf.keras.models.load_model(model_path)
+
+        def representativeDataset():
+            for sample in samples:
+                yield [sample[np.newaxis].astype(np.float32)]
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representativeDataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(converter.convert())
+        os.replace(temp_path, output_path)
+        return str(output_path)
+
+    def compareModels(self, reference_path, candidate_path, samples):
+        # Accuracy drift of a converted model against the model it comes from
+        from InferenceBackends import loadBackend
+        reference = loadBackend(reference_path).predict(samples)
+        candidate = loadBackend(candidate_path).predict(samples)
+        confidence_difference = np.abs(candidate - reference)
+        return {
+            'reference_model': str(reference_path),
+            'candidate_model': str(candidate_path),
+            'samples': int(len(samples)),
+            'label_agreement': float(np.mean(np.argmax(candidate, axis=1) == np.argmax(reference, axis=1))),
+            'mean_score_difference': float(np.mean(confidence_difference)),
+            'max_score_difference': float(np.max(confidence_difference))
+        }
+
+    def getAvailableBackends(self):
+        backends = ['keras', 'tflite']
+        if importlib.util.find_spec('tf2onnx') and importlib.util.find_spec('onnxruntime'):
+            backends.append('onnx')
+        return backends
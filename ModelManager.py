@@ -1,11 +1,14 @@
 import os 
 import json
+import numpy as np
 from pathlib import Path
+from ModelConverter import ModelConverter
 
 class ModelManager:
-    def __init__(self, default_model_path, default_classes_json):
+    def __init__(self, default_model_path, default_classes_json, model_converter=None):
         self.models = {}
         self.custom_models_file = self.getCustomModelsFile()
+        self.model_converter = model_converter or ModelConverter()
         
         self.loadDefultModel(default_model_path, default_classes_json)
         self.loadCustomModels()
@@ -30,7 +33,8 @@ class ModelManager:
             self.models['Default'] = {
                 'path': default_model_path,
                 'classes': classes_info['default'],
-                'model_name': 'Default'
+                'model_name': 'Default',
+                'preprocessing': 'quality'
             }
             print("Default model loaded successfully.")
         except Exception as e:
@@ -45,7 +49,8 @@ class ModelManager:
                     self.models[model_name] = {
                         'path': model_info['path'],
                         'classes': model_info['classes'],
-                        'model_name': model_name
+                        'model_name': model_name,
+                        'preprocessing': model_info.get('preprocessing', 'quality')
                     }
                 print("Custom models loaded successfully.")
             except Exception as e:
@@ -56,7 +61,8 @@ class ModelManager:
             models_to_save = {
                 model_name: {
                     'path': model_info['path'],
-                    'classes': model_info['classes']
+                    'classes': model_info['classes'],
+                    'preprocessing': model_info['preprocessing']
                 }
                 for model_name, model_info in self.models.items()
                 if model_name != 'Default'
@@ -66,7 +72,7 @@ class ModelManager:
         except Exception as e:
             print(f"Error saving custom models: {e}")
 
-    def addModel(self, name, model_path, classes):
+    def addModel(self, name, model_path, classes, preprocessing='quality'):
         if name == 'Default':
             print("Cannot add a new model with the name 'Default'.")
             return
@@ -78,7 +84,8 @@ class ModelManager:
             self.models[name] = {
                 'path': model_path,
                 'classes': classes,
-                'model_name': name
+                'model_name': name,
+                'preprocessing': preprocessing
             }
             print(f"Model '{name}' added successfully.")
             self.saveCustomModels()
@@ -86,6 +93,74 @@ class ModelManager:
             print(f"Error adding model: {e}")
             raise
 
+    def convertModel(self, name, backends):
+        # Convert to the given backends before a run that uses them, failures only mean
+        # the model keeps running on Keras
+        model_info = self.models.get(name)
+        if model_info is None:
+            return
+        for backend in backends:
+            try:
+                self.model_converter.convert(model_info['path'], backend)
+            except Exception as e:
+                print(f"Error converting model '{name}' to {backend}: {e}")
+
+    def addQuantizedModel(self, name, samples, holdout=0.25, is_cancelled=None):
+        # The int8 variant is stored next to the original model and registered as a new model.
+        # A random holdout share of the samples is kept out of the calibration to measure the drift.
+        # is_cancelled is checked between the steps, a cancelled quantization returns None.
+        model_info = self.models.get(name)
+        if model_info is None:
+            raise ValueError(f"Model '{name}' not found.")
+        if len(samples) < 2:
+            raise ValueError("At least two samples are needed to calibrate and evaluate the model.")
+
+        order = np.random.default_rng(0).permutation(len(samples))
+        evaluation_count = min(len(samples) - 1, max(1, int(len(samples) * holdout)))
+        evaluation_samples = samples[order[:evaluation_count]]
+        calibration_samples = samples[order[evaluation_count:]]
+
+        # Written under a temporary name, so a cancelled run never replaces an earlier int8 variant
+        base_path = os.path.splitext(model_info['path'])[0]
+        quantized_path = f"{base_path}_int8.tflite"
+        partial_path = self.model_converter.quantize(model_info['path'], calibration_samples,
+                                                     f"{base_path}_int8.partial.tflite")
+        try:
+            if is_cancelled is not None and is_cancelled():
+                return None
+            report = self.model_converter.compareModels(model_info['path'], partial_path, evaluation_samples)
+            report['candidate_model'] = quantized_path
+            report['calibration_samples'] = int(len(calibration_samples))
+            if is_cancelled is not None and is_cancelled():
+                return None
+            os.replace(partial_path, quantized_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        with open(f"{base_path}_int8_report.json", 'w') as f:
+            json.dump(report, f, indent=2)
+
+        quantized_name = f"{name} (int8)"
+        self.models[quantized_name] = {
+            'path': quantized_path,
+            'classes': model_info['classes'],
+            'model_name': quantized_name,
+            'preprocessing': model_info['preprocessing']
+        }
+        self.saveCustomModels()
+        print(f"Model '{quantized_name}' added successfully.")
+        return quantized_name, report
+
+    def getBackendPath(self, name, backend):
+        model_info = self.models.get(name)
+        if model_info is None:
+            return None
+        return self.model_converter.convert(model_info['path'], backend)
+
+    def setModelInfo(self, name, model_info):
+        # In memory only, used by the batch workers to follow the models of the main process
+        self.models[name] = model_info
+
     def getModel(self, name):
         return self.models.get(name)
 
@@ -97,6 +172,10 @@ class ModelManager:
         model_info = self.models.get(name)
         return model_info['classes'] if model_info else None
 
+    def getModelPreprocessing(self, name):
+        model_info = self.models.get(name)
+        return model_info['preprocessing'] if model_info else None
+
     def getModelNames(self):
         return list(self.models.keys())
 
@@ -0,0 +1,41 @@
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+class QuantizationWorker(QObject):
+    # quantized model name, accuracy drift report
+    quantized = pyqtSignal(str, object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+    def __init__(self, model_manager, image_analyzer, model_name, image_paths, max_samples=200):
+        super().__init__()
+        self.model_manager = model_manager
+        self.image_analyzer = image_analyzer
+        self.model_name = model_name
+        self.image_paths = list(image_paths)
+        self.max_samples = max_samples
+        self.is_cancelled = False
+
+    def cancel(self):
+        # Checked between images and between steps, the TensorFlow conversion itself runs to the end
+        self.is_cancelled = True
+
+    def isCancelled(self):
+        return self.is_cancelled
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            samples = self.image_analyzer.getSampleBatch(self.image_paths, self.model_name, self.max_samples,
+                                                         self.isCancelled)
+            result = None
+            if not self.is_cancelled:
+                result = self.model_manager.addQuantizedModel(self.model_name, samples,
+                                                              is_cancelled=self.isCancelled)
+            if result is None:
+                self.cancelled.emit()
+            else:
+                self.quantized.emit(*result)
+        except Exception as e:
+            self.failed.emit(str(e))
+        self.finished.emit()
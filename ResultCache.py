@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Hashes are remembered per path, size and mtime so unchanged files are read once per process
+file_hashes = {}
+
+def hashFile(path):
+    stat = os.stat(path)
+    file_id = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if file_id not in file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        file_hashes[file_id] = digest.hexdigest()
+    return file_hashes[file_id]
+
+def getDetectionCacheDir():
+    return Path.home() / '.image_analysis_app' / 'ocr_cache'
+
+class ResultCache:
+    # Also used with its own folder for the OCR detections, whose keys only depend on the image
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir) if cache_dir else self.getDefaultCacheDir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.current_bytes = None
+
+    def getDefaultCacheDir(self):
+        return Path.home() / '.image_analysis_app' / 'result_cache'
+
+    def getKey(self, image_path, model_name, model_path, parameters):
+        key = {
+            'image': hashFile(image_path),
+            'model_name': model_name,
+            'model': hashFile(model_path),
+            'parameters': parameters
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def getImageKey(self, image_path, parameters):
+        key = {
+            'image': hashFile(image_path),
+            'parameters': parameters
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def getEntryPath(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        entry_path = self.getEntryPath(key)
+        try:
+            with open(entry_path, 'r') as f:
+                entry = json.load(f)
+            # Refresh the mtime, eviction removes least recently used entries first
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            return None
+
+        entry['bounding_boxes'] = [(tuple(tl), tuple(br)) for tl, br in entry['bounding_boxes']]
+        return entry
+
+    def put(self, key, text, predictions, bounding_boxes):
+        self.putEntry(key, {
+            'text': text,
+            'predictions': predictions,
+            'bounding_boxes': bounding_boxes
+        })
+
+    def putEntry(self, key, entry):
+        # Write to a temporary file and rename it, so concurrent workers never read partial entries
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        entry_path = self.getEntryPath(key)
+        os.replace(temp_path, entry_path)
+
+        if self.current_bytes is None:
+            self.current_bytes = self.getCacheSize()
+        else:
+            self.current_bytes += os.path.getsize(entry_path)
+        if self.current_bytes > self.max_bytes:
+            self.evict()
+
+    def listEntries(self):
+        entries = []
+        for entry_path in self.cache_dir.glob('*.json'):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        return entries
+
+    def getCacheSize(self):
+        return sum(size for _, size, _ in self.listEntries())
+
+    def evict(self):
+        # Remove least recently used entries until the cache is back under 90% of its budget
+        entries = sorted(self.listEntries(), key=lambda entry: entry[0])
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                entry_path.unlink()
+                total_bytes -= size
+            except OSError:
+                pass
+        self.current_bytes = total_bytes
+
+    def clear(self):
+        for _, _, entry_path in self.listEntries():
+            try:
+                entry_path.unlink()
+            except OSError:
+                pass
+        self.current_bytes = 0
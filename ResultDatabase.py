@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    model_id INTEGER NOT NULL REFERENCES models(id),
+    started REAL NOT NULL,
+    parameters TEXT
+);
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    model_id INTEGER NOT NULL REFERENCES models(id),
+    text TEXT,
+    analyzed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    box INTEGER NOT NULL,
+    x_min INTEGER NOT NULL,
+    y_min INTEGER NOT NULL,
+    x_max INTEGER NOT NULL,
+    y_max INTEGER NOT NULL,
+    label TEXT,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS predictions_image ON predictions(image_id, box);
+CREATE INDEX IF NOT EXISTS predictions_label ON predictions(label, confidence);
+CREATE INDEX IF NOT EXISTS predictions_confidence ON predictions(confidence);
+"""
+
+class ResultDatabase:
+    # SQLite store with the same interface as ResultManager. Results are buffered and written in
+    # one transaction every batch_size images, and before any read. The database is in WAL mode
+    # so readers do not block the writer, and several processes can write to the same file.
+    def __init__(self, database_path, batch_size=64, busy_timeout=30000):
+        self.database_path = os.path.abspath(database_path)
+        self.batch_size = batch_size
+        self.busy_timeout = busy_timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pending = []
+        # Run of each model in this session, created with its first result
+        self.runs = {}
+        os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
+        connection = self.getConnection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def __getstate__(self):
+        # Connections stay in their process, the database is reopened after pickling
+        with self.lock:
+            return {'database_path': self.database_path, 'batch_size': self.batch_size,
+                    'busy_timeout': self.busy_timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.runs = {}
+
+    def getConnection(self):
+        # One connection per thread, sqlite3 connections cannot be shared between threads
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.database_path, timeout=self.busy_timeout / 1000)
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self.local.connection = connection
+        return connection
+
+    def getId(self, connection, table, column, value):
+        connection.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+        return connection.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+
+    def startRun(self, model, parameters=None):
+        # A run groups the images analyzed together with the same model and parameters
+        self.flush()
+        connection = self.getConnection()
+        with connection:
+            model_id = self.getId(connection, 'models', 'name', model)
+            run_id = connection.execute(
+                "INSERT INTO runs (model_id, started, parameters) VALUES (?, ?, ?)",
+                (model_id, time.time(), json.dumps(parameters) if parameters is not None else None)
+            ).lastrowid
+        self.runs[model] = run_id
+        return run_id
+
+    def addResult(self, image_path, model, text, predictions, bounding_boxes):
+        with self.lock:
+            self.pending.append((image_path, model, text, predictions, bounding_boxes, time.time()))
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        # Only the last analysis of an image buffered several times is written
+        pending = list({result[0]: result for result in pending}.values())
+        for model in {result[1] for result in pending} - set(self.runs):
+            self.startRun(model)
+
+        connection = self.getConnection()
+        with connection:
+            rows = []
+            for image_path, model, text, predictions, bounding_boxes, analyzed in pending:
+                model_id = self.getId(connection, 'models', 'name', model)
+                # A new analysis of an image replaces the previous one and keeps its position
+                connection.execute(
+                    "INSERT INTO images (path, run_id, model_id, text, analyzed) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET run_id = excluded.run_id, model_id = excluded.model_id, "
+                    "text = excluded.text, analyzed = excluded.analyzed",
+                    (image_path, self.runs[model], model_id, text, analyzed)
+                )
+                image_id = connection.execute("SELECT id FROM images WHERE path = ?", (image_path,)).fetchone()[0]
+                connection.execute("DELETE FROM predictions WHERE image_id = ?", (image_id,))
+
+                predictions_by_box = {prediction.get('box', i): prediction
+                                      for i, prediction in enumerate(predictions, 1)}
+                for box, ((x_min, y_min), (x_max, y_max)) in enumerate(bounding_boxes, 1):
+                    prediction = predictions_by_box.get(box, {})
+                    rows.append((image_id, box, int(x_min), int(y_min), int(x_max), int(y_max),
+                                 prediction.get('label'), prediction.get('confidence')))
+            connection.executemany("INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.flush()
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def buildResult(self, connection, image_id, model, text):
+        rows = connection.execute(
+            "SELECT box, x_min, y_min, x_max, y_max, label, confidence FROM predictions "
+            "WHERE image_id = ? ORDER BY box", (image_id,)
+        ).fetchall()
+        return {
+            'model': model,
+            'text': text,
+            'predictions': [{'box': box, 'label': label, 'confidence': confidence}
+                            for box, _, _, _, _, label, confidence in rows if label is not None],
+            'bounding_boxes': [((x_min, y_min), (x_max, y_max)) for _, x_min, y_min, x_max, y_max, _, _ in rows]
+        }
+
+    def getResult(self, image_path):
+        self.flush()
+        connection = self.getConnection()
+        row = connection.execute(
+            "SELECT images.id, models.name, images.text FROM images JOIN models ON models.id = images.model_id "
+            "WHERE images.path = ?", (image_path,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self.buildResult(connection, *row)
+
+    def getResultPage(self, offset=0, limit=100):
+        # Results of the images in analysis order, a page at a time
+        self.flush()
+        connection = self.getConnection()
+        rows = connection.execute(
+            "SELECT images.path, images.id, models.name, images.text FROM images "
+            "JOIN models ON models.id = images.model_id ORDER BY images.id LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return {image_path: self.buildResult(connection, image_id, model, text)
+                for image_path, image_id, model, text in rows}
+
+    def getImagePaths(self, offset=0, limit=-1):
+        self.flush()
+        return [row[0] for row in self.getConnection().execute(
+            "SELECT path FROM images ORDER BY id LIMIT ? OFFSET ?", (limit, offset))]
+
+    def countImages(self):
+        self.flush()
+        return self.getConnection().execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def getAllResult(self):
+        return self.getResultPage(0, -1)
+
+    def clearResult(self):
+        # Ends the session only, the stored results are kept. The next results start new runs.
+        self.flush()
+        self.runs = {}
+
+    def selectBoxes(self, columns, label=None, min_confidence=None, max_confidence=None, image_path=None,
+                    model=None, suffix=""):
+        # Same filters as ResultManager.query, boxes without a prediction are only matched without filters
+        self.flush()
+        conditions = []
+        parameters = []
+        for condition, value in [("predictions.label = ?", label),
+                                 ("predictions.confidence >= ?", min_confidence),
+                                 ("predictions.confidence <= ?", max_confidence),
+                                 ("images.path = ?", image_path),
+                                 ("models.name = ?", model)]:
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.getConnection().execute(
+            f"SELECT {columns} FROM predictions JOIN images ON images.id = predictions.image_id "
+            f"JOIN models ON models.id = images.model_id {where} {suffix}", parameters
+        ).fetchall()
+
+    def queryBoxes(self, **filters):
+        return [
+            {'image_path': image_path, 'box': box, 'label': label, 'confidence': confidence,
+             'bounding_box': ((x_min, y_min), (x_max, y_max))}
+            for image_path, box, label, confidence, x_min, y_min, x_max, y_max in self.selectBoxes(
+                "images.path, predictions.box, predictions.label, predictions.confidence, "
+                "predictions.x_min, predictions.y_min, predictions.x_max, predictions.y_max",
+                suffix="ORDER BY images.id, predictions.box", **filters)
+        ]
+
+    def countByLabel(self, **filters):
+        return dict(self.selectBoxes("predictions.label, COUNT(*)",
+                                     suffix="GROUP BY predictions.label HAVING predictions.label IS NOT NULL",
+                                     **filters))
+
+    def getConfidenceStats(self, **filters):
+        return {
+            label: {'count': count, 'mean': mean, 'min': minimum, 'max': maximum}
+            for label, count, mean, minimum, maximum in self.selectBoxes(
+                "predictions.label, COUNT(*), AVG(predictions.confidence), MIN(predictions.confidence), "
+                "MAX(predictions.confidence)",
+                suffix="GROUP BY predictions.label HAVING predictions.label IS NOT NULL", **filters)
+        }
+
+    def getImagesWith(self, **filters):
+        return [row[0] for row in self.selectBoxes("DISTINCT images.path", suffix="ORDER BY images.id", **filters)]
@@ -0,0 +1,123 @@
+import os
+import cv2
+import json
+from BoundingBoxesDrawer import getBoxPredictions, drawLabelledBoxes
+
+METADATA_FILENAME = "analysis_metadata.json"
+# JSON-Lines log of streamed exports, one {"key": image_filename, "entry": {...}} object per line
+METADATA_LOG_FILENAME = "analysis_metadata.jsonl"
+
+def readMetadataLog(log_path):
+    # Yields (image_filename, entry), a line cut short by a crash is skipped
+    with open(log_path, 'r') as log_file:
+        for line in log_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            yield record['key'], record['entry']
+
+def loadMetadata(result_folder):
+    # The log of a streamed export is complete even when the export was interrupted
+    log_path = os.path.join(result_folder, METADATA_LOG_FILENAME)
+    if os.path.exists(log_path):
+        return dict(readMetadataLog(log_path))
+    json_path = os.path.join(result_folder, METADATA_FILENAME)
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, 'r') as jsonfile:
+        return json.load(jsonfile)
+
+class ResultExporter:
+    def __init__(self, model_manager, stage_timer=None):
+        self.model_manager = model_manager
+        self.stage_timer = stage_timer
+
+    def saveResults(self, result_folder, results):
+        os.makedirs(result_folder, exist_ok=True)
+        saved_results = {}
+
+        for image_path, result in results.items():
+            self.saveTimedImage(image_path, result, result_folder, saved_results)
+
+        self.saveMetadata(result_folder, saved_results)
+        return saved_results
+
+    def saveTimedImage(self, image_path, result, result_folder, saved_results, annotated_image=None):
+        if self.stage_timer is None:
+            self.saveAnalyzedImage(image_path, result, result_folder, saved_results, annotated_image)
+            return
+        # Saving gets its own timing record per image, kept out of the analysis totals
+        self.stage_timer.start(image_path, kind='export')
+        try:
+            with self.stage_timer.stage('save'):
+                self.saveAnalyzedImage(image_path, result, result_folder, saved_results, annotated_image)
+        finally:
+            self.stage_timer.finish()
+
+    def saveAnalyzedImage(self, image_path, result, result_folder, saved_results, annotated_image=None):
+        # The annotated image of the analysis is written as is, otherwise it is redrawn from the original.
+        # Batch workers send it already encoded in the format of the original file.
+        if annotated_image is None:
+            image = cv2.imread(image_path)
+            if image is None:
+                return
+            annotated_image = self.drawBoundingBoxes(image, result['predictions'], result['bounding_boxes'])
+
+        image_filename = self.getImageFilename(image_path)
+        image_save_path = os.path.join(result_folder, image_filename)
+        if isinstance(annotated_image, bytes):
+            with open(image_save_path, 'wb') as f:
+                f.write(annotated_image)
+        else:
+            cv2.imwrite(image_save_path, annotated_image)
+
+        text_filename = f"result_{os.path.basename(image_path)}.txt"
+        text_save_path = os.path.join(result_folder, text_filename)
+        self.saveResultText(text_save_path, image_path, result)
+
+        saved_results[image_filename] = {
+            'image_path': image_save_path,
+            'text_path': text_save_path,
+            'original_path': image_path,
+            'model': result['model'],
+            'classes': self.model_manager.getModelClasses(result['model']),
+            'predictions': result['predictions'],
+            'bounding_boxes': result['bounding_boxes']
+        }
+
+    def getImageFilename(self, image_path):
+        return f"annotated_{os.path.basename(image_path)}"
+
+    def saveResultText(self, save_path, image_path, result):
+        with open(save_path, 'w') as f:
+            f.write(f"Image: {os.path.basename(image_path)}\n")
+            f.write(f"Model: {result['model']}\n")
+            f.write(f"Classes: {', '.join(self.model_manager.getModelClasses(result['model']))}\n\n")
+            f.write("Predictions:\n")
+            f.write(self.formatPredictions(result['predictions'], result['bounding_boxes'], "  "))
+
+    def formatPredictions(self, predictions, bounding_boxes, indent=""):
+        # Same box numbers and labels as the drawn images, boxes without a prediction are listed too
+        box_predictions = getBoxPredictions(predictions)
+        lines = []
+        for i, bbox in enumerate(bounding_boxes, 1):
+            pred = box_predictions.get(i)
+            if pred is None:
+                lines.append(f"{indent}Box {i}: no prediction\n")
+            else:
+                lines.append(f"{indent}Box {i}: {pred['label']} (Confidence: {pred['confidence']:.2f})\n")
+            lines.append(f"{indent}  Coordinates: Top-Left {bbox[0]}, Bottom-Right {bbox[1]}\n")
+        return ''.join(lines)
+
+    def saveMetadata(self, result_folder, saved_results):
+        json_path = os.path.join(result_folder, METADATA_FILENAME)
+        with open(json_path, 'w') as jsonfile:
+            json.dump(saved_results, jsonfile, indent=2)
+        # A log left by a previous streamed export would shadow these results when loading
+        log_path = os.path.join(result_folder, METADATA_LOG_FILENAME)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+
+    def drawBoundingBoxes(self, image, predictions, bounding_boxes, scale=1.0):
+        return drawLabelledBoxes(image, bounding_boxes, predictions, scale)
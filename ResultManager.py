@@ -1,20 +1,228 @@
+import numpy as np
+
+# One row per bounding box, boxes without a prediction have label -1 and a NaN confidence
+BOX_DTYPE = np.dtype([
+    ('image', np.int32),
+    ('box', np.int32),
+    ('x_min', np.int32),
+    ('y_min', np.int32),
+    ('x_max', np.int32),
+    ('y_max', np.int32),
+    ('label', np.int32),
+    ('confidence', np.float64)
+])
+
 class ResultManager:
-    def __init__(self):
-        self.results = {}
+    def __init__(self, initial_capacity=1024):
+        self.initial_capacity = initial_capacity
+        self.clearResult()
+
+    def clearResult(self):
+        self.rows = np.zeros(self.initial_capacity, dtype=BOX_DTYPE)
+        self.size = 0
+        self.dead_rows = 0
+        # Per image columns indexed by image id, the rows of an image are contiguous
+        self.image_paths = []
+        self.image_ids = {}
+        self.image_models = []
+        self.image_texts = []
+        self.image_ranges = []
+        self.labels = []
+        self.label_ids = {}
+        self.models = []
+        self.model_ids = {}
+        self.indexes = None
+
+    def getId(self, value, values, ids):
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = len(values)
+            values.append(value)
+            ids[value] = value_id
+        return value_id
 
     def addResult(self, image_path, model, text, predictions, bounding_boxes):
-        self.results[image_path] = {
-            'model': model,
-            'text': text,
-            'predictions': predictions,
-            'bounding_boxes': bounding_boxes
-        }
+        image_id = self.image_ids.get(image_path)
+        if image_id is None:
+            image_id = self.getId(image_path, self.image_paths, self.image_ids)
+            self.image_models.append(None)
+            self.image_texts.append(None)
+            self.image_ranges.append(None)
+        else:
+            # A new analysis replaces the boxes of the previous one
+            self.removeRows(image_id)
+        self.image_models[image_id] = self.getId(model, self.models, self.model_ids)
+        self.image_texts[image_id] = text
+
+        rows = np.zeros(len(bounding_boxes), dtype=BOX_DTYPE)
+        rows['image'] = image_id
+        rows['box'] = np.arange(1, len(rows) + 1)
+        if len(rows):
+            coordinates = np.array(bounding_boxes, dtype=np.int64).reshape(-1, 4)
+            rows['x_min'], rows['y_min'], rows['x_max'], rows['y_max'] = coordinates.T
+        rows['label'] = -1
+        rows['confidence'] = np.nan
+        for i, prediction in enumerate(predictions, 1):
+            box = prediction.get('box', i)
+            if 1 <= box <= len(rows):
+                rows['label'][box - 1] = self.getId(prediction['label'], self.labels, self.label_ids)
+                rows['confidence'][box - 1] = prediction['confidence']
+        self.image_ranges[image_id] = (self.size, len(rows))
+        self.appendRows(rows)
+
+    def appendRows(self, rows):
+        if self.size + len(rows) > len(self.rows):
+            capacity = max(len(self.rows) * 2, self.size + len(rows))
+            grown = np.zeros(capacity, dtype=BOX_DTYPE)
+            grown[:self.size] = self.rows[:self.size]
+            self.rows = grown
+        self.rows[self.size:self.size + len(rows)] = rows
+        self.size += len(rows)
+        self.indexes = None
+
+    def removeRows(self, image_id):
+        # Rows are marked dead and compacted away once they are half of the store
+        start, count = self.image_ranges[image_id]
+        self.rows['image'][start:start + count] = -1
+        self.image_ranges[image_id] = (0, 0)
+        self.dead_rows += count
+        self.indexes = None
+        if self.dead_rows * 2 > self.size:
+            self.compact()
+
+    def compact(self):
+        alive = self.getRows()[self.getRows()['image'] >= 0]
+        self.rows = np.zeros(max(len(alive), self.initial_capacity), dtype=BOX_DTYPE)
+        self.rows[:len(alive)] = alive
+        self.size = len(alive)
+        self.dead_rows = 0
+        image_ids, starts, counts = np.unique(alive['image'], return_index=True, return_counts=True)
+        for image_id, start, count in zip(image_ids, starts, counts):
+            self.image_ranges[image_id] = (int(start), int(count))
+
+    def getRows(self):
+        return self.rows[:self.size]
+
+    def getImageRows(self, image_id):
+        start, count = self.image_ranges[image_id]
+        return self.rows[start:start + count]
+
+    def getIndexes(self):
+        # Sorted orders over the live rows, rebuilt on the first query after a change
+        if self.indexes is None:
+            rows = self.getRows()
+            alive = np.flatnonzero(rows['image'] >= 0)
+            indexes = {}
+            for column in ('label', 'confidence'):
+                order = alive[np.argsort(rows[column][alive], kind='stable')]
+                indexes[column] = (order, rows[column][order])
+            self.indexes = indexes
+        return self.indexes
+
+    def findRange(self, column, low, high):
+        # Row numbers whose column value is in [low, high]
+        order, values = self.getIndexes()[column]
+        start = np.searchsorted(values, low, side='left')
+        end = np.searchsorted(values, high, side='right')
+        return order[start:end]
 
     def getResult(self, image_path):
-        return self.results.get(image_path)
+        image_id = self.image_ids.get(image_path)
+        if image_id is None:
+            return None
+        rows = self.getImageRows(image_id)
+        return {
+            'model': self.models[self.image_models[image_id]],
+            'text': self.image_texts[image_id],
+            'predictions': [
+                {'box': int(row['box']), 'label': self.labels[row['label']], 'confidence': float(row['confidence'])}
+                for row in rows if row['label'] >= 0
+            ],
+            'bounding_boxes': [
+                ((int(row['x_min']), int(row['y_min'])), (int(row['x_max']), int(row['y_max']))) for row in rows
+            ]
+        }
 
     def getAllResult(self):
-        return self.results
+        return {image_path: self.getResult(image_path) for image_path in self.image_paths}
 
-    def clearResult(self):
-        self.results.clear()
\ No newline at end of file
+    def getResultPage(self, offset=0, limit=100):
+        return {image_path: self.getResult(image_path) for image_path in self.getImagePaths(offset, limit)}
+
+    def getImagePaths(self, offset=0, limit=-1):
+        return self.image_paths[offset:] if limit < 0 else self.image_paths[offset:offset + limit]
+
+    def countImages(self):
+        return len(self.image_paths)
+
+    def query(self, label=None, min_confidence=None, max_confidence=None, image_path=None, model=None):
+        # Rows of the boxes matching every given filter, as a structured array of BOX_DTYPE.
+        # The most selective index available narrows the candidates before the other filters.
+        rows = self.getRows()
+        if image_path is not None:
+            image_id = self.image_ids.get(image_path)
+            if image_id is None:
+                return rows[:0]
+            start, count = self.image_ranges[image_id]
+            candidates = np.arange(start, start + count)
+        elif label is not None:
+            label_id = self.label_ids.get(label)
+            if label_id is None:
+                return rows[:0]
+            candidates = self.findRange('label', label_id, label_id)
+        elif min_confidence is not None or max_confidence is not None:
+            candidates = self.findRange('confidence', -np.inf if min_confidence is None else min_confidence,
+                                        np.inf if max_confidence is None else max_confidence)
+        else:
+            candidates = np.flatnonzero(rows['image'] >= 0)
+
+        selected = rows[np.sort(candidates)]
+        mask = np.ones(len(selected), dtype=bool)
+        if label is not None:
+            mask &= selected['label'] == self.label_ids.get(label, -2)
+        if min_confidence is not None:
+            mask &= selected['confidence'] >= min_confidence
+        if max_confidence is not None:
+            mask &= selected['confidence'] <= max_confidence
+        if model is not None:
+            image_models = np.array(self.image_models, dtype=np.int32)
+            mask &= image_models[selected['image']] == self.model_ids.get(model, -2)
+        return selected[mask]
+
+    def queryBoxes(self, **filters):
+        # Same filters as query, as a list of dictionaries for display and export
+        return [
+            {
+                'image_path': self.image_paths[row['image']],
+                'box': int(row['box']),
+                'label': self.labels[row['label']] if row['label'] >= 0 else None,
+                'confidence': float(row['confidence']),
+                'bounding_box': ((int(row['x_min']), int(row['y_min'])), (int(row['x_max']), int(row['y_max'])))
+            }
+            for row in self.query(**filters)
+        ]
+
+    def countByLabel(self, **filters):
+        rows = self.query(**filters)
+        rows = rows[rows['label'] >= 0]
+        counts = np.bincount(rows['label'], minlength=len(self.labels))
+        return {self.labels[label_id]: int(count) for label_id, count in enumerate(counts) if count}
+
+    def getConfidenceStats(self, **filters):
+        # Count, mean, minimum and maximum confidence per label
+        rows = self.query(**filters)
+        rows = rows[rows['label'] >= 0]
+        stats = {}
+        for label_id in np.unique(rows['label']):
+            confidences = rows['confidence'][rows['label'] == label_id]
+            stats[self.labels[label_id]] = {
+                'count': int(len(confidences)),
+                'mean': float(confidences.mean()),
+                'min': float(confidences.min()),
+                'max': float(confidences.max())
+            }
+        return stats
+
+    def getImagesWith(self, **filters):
+        image_ids = np.unique(self.query(**filters)['image'])
+        return [self.image_paths[image_id] for image_id in image_ids]
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+STAGE_ORDER = ['decode', 'cache', 'readtext', 'crop', 'preprocess', 'segment', 'predict', 'draw', 'save']
+
+class StageTimer:
+    def __init__(self, max_records=10000):
+        # Only the most recent records are kept so long batches stay bounded in memory
+        self.records = deque(maxlen=max_records)
+        # The record being filled is per thread, so analysis and export threads can share a timer
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    @property
+    def current(self):
+        return getattr(self.local, 'current', None)
+
+    @current.setter
+    def current(self, record):
+        self.local.current = record
+
+    def start(self, image_path, kind='analysis'):
+        # kind tells the analysis records from the save-only records of the exporters
+        self.current = {
+            'image': image_path,
+            'kind': kind,
+            'start': time.time(),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'stages': {},
+            'events': []
+        }
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        wall_start = time.time()
+        try:
+            yield
+        finally:
+            self.addStage(name, time.perf_counter() - start, wall_start)
+
+    def addStage(self, name, seconds, wall_start=None):
+        if self.current is None:
+            return
+        self.current['stages'][name] = self.current['stages'].get(name, 0.0) + seconds
+        self.current['events'].append({'stage': name, 'start': wall_start or time.time(), 'seconds': seconds})
+
+    def finish(self):
+        record = self.current
+        self.current = None
+        if record is not None:
+            record['total'] = sum(record['stages'].values())
+            self.addRecord(record)
+        return record
+
+    def addRecord(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def getLastTimings(self):
+        with self.lock:
+            return self.records[-1] if self.records else None
+
+    def getRecords(self):
+        with self.lock:
+            return list(self.records)
+
+    def getSummary(self):
+        # p50, p95 and max per stage in seconds, across all the recorded images. The total row
+        # covers whole analyses only, export records are reported in their 'save' row.
+        per_stage = {}
+        for record in self.getRecords():
+            for name, seconds in record['stages'].items():
+                per_stage.setdefault(name, []).append(seconds)
+            if record.get('kind', 'analysis') == 'analysis':
+                per_stage.setdefault('total', []).append(record['total'])
+
+        ordered = [name for name in STAGE_ORDER + ['total'] if name in per_stage]
+        ordered += sorted(name for name in per_stage if name not in ordered)
+        summary = {}
+        for name in ordered:
+            values = np.array(per_stage[name])
+            summary[name] = {
+                'count': int(len(values)),
+                'total': float(values.sum()),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'max': float(values.max())
+            }
+        return summary
+
+    def formatSummary(self):
+        summary = self.getSummary()
+        if not summary:
+            return "No timings recorded."
+        lines = [f"{'stage':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total s':>10}"]
+        for name, values in summary.items():
+            lines.append(f"{name:<12}{values['count']:>7}{values['p50'] * 1000:>10.1f}{values['p95'] * 1000:>10.1f}"
+                         f"{values['max'] * 1000:>10.1f}{values['total']:>10.2f}")
+        return "\n".join(lines)
+
+    def dumpJson(self, path):
+        with open(path, 'w') as f:
+            json.dump({'summary': self.getSummary(), 'records': self.getRecords()}, f, indent=2)
+
+    def dumpTrace(self, path):
+        # Chrome trace-event format, viewable in chrome://tracing or Perfetto
+        events = []
+        for record in self.getRecords():
+            for event in record['events']:
+                events.append({
+                    'name': event['stage'],
+                    'ph': 'X',
+                    'ts': event['start'] * 1e6,
+                    'dur': event['seconds'] * 1e6,
+                    'pid': record['pid'],
+                    'tid': record['tid'],
+                    'args': {'image': record['image']}
+                })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events}, f)
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
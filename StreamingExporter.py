@@ -0,0 +1,99 @@
+import os
+import json
+import queue
+import threading
+from ResultExporter import METADATA_FILENAME, METADATA_LOG_FILENAME, readMetadataLog
+
+class StreamingExporter:
+    # Writes the results of every image as soon as it is analyzed, on a background I/O thread.
+    # Each saved image is appended to a JSON-Lines log, so an interrupted export can be resumed
+    # and analysis_metadata.json is rebuilt from the log when the export is closed.
+    def __init__(self, result_exporter, result_folder, resume=False, max_pending=32):
+        self.result_exporter = result_exporter
+        self.result_folder = result_folder
+        self.log_path = os.path.join(result_folder, METADATA_LOG_FILENAME)
+        # Only the paths of the exported images are kept in memory
+        self.exported = set()
+        self.errors = []
+        os.makedirs(result_folder, exist_ok=True)
+
+        if resume and os.path.exists(self.log_path):
+            self.exported.update(entry['original_path'] for _, entry in readMetadataLog(self.log_path))
+            self.truncateIncompleteLine()
+        self.log_file = open(self.log_path, 'a' if resume else 'w')
+
+        # The bounded queue blocks the analysis when the disk cannot keep up
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def truncateIncompleteLine(self):
+        # Drop a last line cut short by a crash, so the next record starts on its own line
+        with open(self.log_path, 'rb+') as log_file:
+            data = log_file.read()
+            if data and not data.endswith(b'\n'):
+                log_file.truncate(data.rfind(b'\n') + 1)
+
+    def isExported(self, image_path):
+        return image_path in self.exported
+
+    def submit(self, image_path, result, annotated_image=None):
+        # result is a ResultManager entry, annotated_image the image returned by ImageAnalyzer.analyze,
+        # or its encoded file from a batch worker
+        self.pending.put((image_path, result, annotated_image))
+
+    def run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            image_path, result, annotated_image = item
+            try:
+                self.saveImage(image_path, result, annotated_image)
+            except Exception as e:
+                print(f"Error exporting image {image_path}: {e}")
+                self.errors.append((image_path, e))
+
+    def saveImage(self, image_path, result, annotated_image):
+        saved_results = {}
+        self.result_exporter.saveTimedImage(image_path, result, self.result_folder, saved_results, annotated_image)
+
+        # The log line is written last, an image is exported only once its files are on disk
+        for image_filename, entry in saved_results.items():
+            self.log_file.write(json.dumps({'key': image_filename, 'entry': entry}) + '\n')
+            self.log_file.flush()
+            self.exported.add(image_path)
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.pending.put(None)
+        self.thread.join()
+        self.thread = None
+        self.log_file.close()
+        self.writeMetadata()
+
+    def writeMetadata(self):
+        # analysis_metadata.json for the readers of the non-streamed exports, built one entry at a
+        # time from the log. Images exported again keep their last entry.
+        offsets = {}
+        with open(self.log_path, 'rb') as log_file:
+            offset = log_file.tell()
+            for line in iter(log_file.readline, b''):
+                try:
+                    offsets[json.loads(line)['key']] = offset
+                except ValueError:
+                    pass
+                offset = log_file.tell()
+
+        json_path = os.path.join(self.result_folder, METADATA_FILENAME)
+        temp_path = json_path + '.tmp'
+        with open(self.log_path, 'rb') as log_file, open(temp_path, 'w') as jsonfile:
+            jsonfile.write('{')
+            for i, (image_filename, offset) in enumerate(offsets.items()):
+                log_file.seek(offset)
+                entry = json.loads(log_file.readline())['entry']
+                jsonfile.write(',\n' if i else '\n')
+                jsonfile.write(f"  {json.dumps(image_filename)}: {json.dumps(entry)}")
+            jsonfile.write('\n}\n')
+        os.replace(temp_path, json_path)
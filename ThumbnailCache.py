@@ -0,0 +1,104 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import cv2
+from PIL import Image as PILImage
+
+# Pillow only reads image headers here, its decompression bomb check would reject large scans
+PILImage.MAX_IMAGE_PIXELS = None
+
+REDUCED_COLOR_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+    (1, cv2.IMREAD_COLOR)
+]
+
+def getImageSize(path):
+    # (width, height) read from the file header, the pixels are not decoded
+    try:
+        with PILImage.open(path) as image:
+            return image.size
+    except (OSError, ValueError):
+        return None
+
+def readReduced(path, max_side):
+    # Decode once, at the smallest reduction that still covers max_side
+    size = getImageSize(path)
+    flag = cv2.IMREAD_COLOR
+    if size is not None:
+        for factor, reduced_flag in REDUCED_COLOR_FLAGS:
+            if max(size) // factor >= max_side:
+                flag = reduced_flag
+                break
+    return cv2.imread(path, flag)
+
+def fitToSide(image, max_side):
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+class ThumbnailCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024, cache_dir=None, max_persisted_side=512):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        # Only small thumbnails are written to disk, display-sized ones stay in memory
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_persisted_side = max_persisted_side
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.thumbnails = OrderedDict()
+        self.lock = threading.Lock()
+
+    def getKey(self, path, max_side):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, max_side)
+
+    def getPersistedPath(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{name}.png"
+
+    def getThumbnail(self, path, max_side=256):
+        # None when the file cannot be read, e.g. an original moved away after its results were saved
+        try:
+            key = self.getKey(path, max_side)
+        except OSError:
+            return None
+        with self.lock:
+            thumbnail = self.thumbnails.get(key)
+            if thumbnail is not None:
+                self.thumbnails.move_to_end(key)
+                return thumbnail
+
+        thumbnail = None
+        persisted_path = None
+        if self.cache_dir is not None and max_side <= self.max_persisted_side:
+            persisted_path = self.getPersistedPath(key)
+        if persisted_path is not None and persisted_path.exists():
+            thumbnail = cv2.imread(str(persisted_path))
+        if thumbnail is None:
+            image = readReduced(path, max_side)
+            if image is None:
+                return None
+            thumbnail = fitToSide(image, max_side)
+            if persisted_path is not None:
+                cv2.imwrite(str(persisted_path), thumbnail)
+
+        with self.lock:
+            if key not in self.thumbnails:
+                self.thumbnails[key] = thumbnail
+                self.current_bytes += thumbnail.nbytes
+            while len(self.thumbnails) > 1 and self.current_bytes > self.max_bytes:
+                _, evicted = self.thumbnails.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+        return thumbnail
+
+    def clear(self):
+        with self.lock:
+            self.thumbnails.clear()
+            self.current_bytes = 0
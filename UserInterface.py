@@ -1,22 +1,53 @@
 import os
 import cv2
 import json
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (
     QMessageBox, QInputDialog, QWidget, QPushButton, QVBoxLayout, QLabel,
     QFileDialog, QComboBox, QScrollArea, QDialog, QListWidgetItem, QHBoxLayout,
-    QMainWindow, QToolBar, QStatusBar, QTabWidget, QListWidget, QSplitter, QFrame, QApplication
+    QMainWindow, QToolBar, QStatusBar, QTabWidget, QListWidget, QSplitter, QFrame, QApplication,
+    QProgressBar, QPlainTextEdit, QCheckBox
 )
-from PyQt5.QtGui import QPixmap, QImage, QIcon, QColor, QPalette
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QPixmap, QImage, QIcon, QColor, QPalette, QPixmapCache
+from PyQt5.QtCore import Qt, QSize, QThread, QTimer
 from Image import Image
+from AnalysisWorker import AnalysisWorker
+from QuantizationWorker import QuantizationWorker
+from ResultExporter import ResultExporter, loadMetadata, METADATA_LOG_FILENAME
+from StreamingExporter import StreamingExporter
+from ThumbnailCache import ThumbnailCache, fitToSide, getImageSize
+from Preprocessing import PREPROCESSING_PROFILES
+from StageTimer import StageTimer
 
 class UserInterface(QMainWindow):
-    def __init__(self, model_manager, image_analyzer, result_manager):
+    # Display resolutions, the smallest one covering the target widget is decoded
+    DISPLAY_SIDES = (256, 512, 1024, 2048, 4096)
+    COMPARISON_SIDE = 300
+    # Side at which the result images are decoded, also used when enlarged
+    RESULT_SIDE = 1024
+
+    def __init__(self, model_manager, image_analyzer, result_manager, batch_analyzer=None, thumbnail_cache=None):
         super().__init__()
         self.model_manager = model_manager
         self.image_analyzer = image_analyzer
+        self.batch_analyzer = batch_analyzer
         self.result_manager = result_manager
+        # Timings of the analyses and exports of this session, shown in the Timings tab
+        self.stage_timer = StageTimer()
+        self.result_exporter = ResultExporter(model_manager, self.stage_timer)
+        self.thumbnail_cache = thumbnail_cache or ThumbnailCache()
         self.current_images = []
+        self.analysis_thread = None
+        self.analysis_worker = None
+        self.displayed_image = None
+        self.displayed_pixmap = None
+        self.displayed_side = 0
+        # Annotated images saved with loaded results, by original image path
+        self.annotated_paths = {}
+        self.load_generation = 0
+        self.prefetch_executor = None
+        self.prefetch_futures = []
+        QPixmapCache.setCacheLimit(64 * 1024)
         self.initUI()
 
     def initUI(self):
@@ -65,6 +96,7 @@ class UserInterface(QMainWindow):
         panel.setTabPosition(QTabWidget.North)
         panel.addTab(self.createImageView(), "Image View")
         panel.addTab(self.createResultsView(), "Results")
+        panel.addTab(self.createTimingsView(), "Timings")
         return panel
 
     def createImageView(self):
@@ -78,6 +110,47 @@ class UserInterface(QMainWindow):
         self.results_view = QScrollArea(widgetResizable=True)
         return self.results_view
 
+    def createTimingsView(self):
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        self.timings_text = QPlainTextEdit(readOnly=True)
+        self.timings_text.setStyleSheet("font-family: monospace;")
+        self.timings_text.setPlainText(self.stage_timer.formatSummary())
+        layout.addWidget(self.timings_text)
+
+        buttons = QHBoxLayout()
+        for text, callback in [("Save JSON", self.saveTimingsJson), ("Save Trace", self.saveTimingsTrace),
+                               ("Reset", self.resetTimings)]:
+            button = QPushButton(text)
+            button.clicked.connect(callback)
+            buttons.addWidget(button)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        return widget
+
+    def updateTimingsView(self):
+        self.timings_text.setPlainText(self.stage_timer.formatSummary())
+
+    def onImageTimed(self, timings):
+        self.stage_timer.addRecord(timings)
+        self.updateTimingsView()
+
+    def saveTimingsJson(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Timings", "timings.json", "JSON Files (*.json)")
+        if file_path:
+            self.stage_timer.dumpJson(file_path)
+            self.updateStatus(f"Timings saved to {file_path}")
+
+    def saveTimingsTrace(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "timings.trace.json", "JSON Files (*.json)")
+        if file_path:
+            self.stage_timer.dumpTrace(file_path)
+            self.updateStatus(f"Trace saved to {file_path}")
+
+    def resetTimings(self):
+        self.stage_timer.clear()
+        self.updateTimingsView()
+
     def createToolbar(self):
         toolbar = QToolBar(movable=False)
         toolbar.setIconSize(QSize(32, 32))
@@ -107,6 +180,13 @@ class UserInterface(QMainWindow):
         self.addToolbarButton(toolbar, 'Icons/clear.png', 'Clear', self.clear)
         self.addToolbarButton(toolbar, 'Icons/load_results.png', 'Load Results', self.loadResults)
         self.addToolbarButton(toolbar, 'Icons/download_results.png', 'Download Results', self.downloadResults)
+        find_button = QPushButton("Find Boxes")
+        find_button.setToolTip("List the boxes of a label below a confidence across all the results")
+        find_button.clicked.connect(self.findBoxes)
+        toolbar.addWidget(find_button)
+        self.stream_checkbox = QCheckBox("Export while analyzing")
+        self.stream_checkbox.setToolTip("Save the results of every image as soon as it is analyzed")
+        toolbar.addWidget(self.stream_checkbox)
 
     def addToolbarButton(self, toolbar, icon, tooltip, callback):
         button = QPushButton(QIcon(icon), "")
@@ -120,6 +200,16 @@ class UserInterface(QMainWindow):
         self.statusBar = QStatusBar(self)
         self.setStatusBar(self.statusBar)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFixedWidth(200)
+        self.progress_bar.hide()
+        self.statusBar.addPermanentWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancelAnalysis)
+        self.cancel_button.hide()
+        self.statusBar.addPermanentWidget(self.cancel_button)
+
     def applyStyles(self):
         self.setColorScheme()
         self.setStyleSheet(self.getStyleSheet())
@@ -252,8 +342,25 @@ class UserInterface(QMainWindow):
         except Exception as e:
             self.showError(f"Error adding image {image_path}: {str(e)}")
 
+    def restoreSession(self, offset=0, page_size=500, generation=None):
+        # Images of a persistent result store are listed a page at a time, results are read on selection
+        if offset == 0:
+            generation = self.load_generation
+        elif generation != self.load_generation:
+            return
+        image_paths = self.result_manager.getImagePaths(offset, page_size)
+        for image_path in image_paths:
+            if os.path.exists(image_path):
+                image = Image(image_path)
+                self.current_images.append(image)
+                self.addImageToList(image)
+        if len(image_paths) == page_size:
+            QTimer.singleShot(0, lambda: self.restoreSession(offset + page_size, page_size, generation))
+        else:
+            self.updateStatus(f"Restored {len(self.current_images)} analyzed images")
+
     def addImageToList(self, image):
-        item = QListWidgetItem(os.path.basename(image.path))
+        item = QListWidgetItem(image.name)
         item.setData(Qt.UserRole, image)
         self.image_list.addItem(item)
 
@@ -261,30 +368,84 @@ class UserInterface(QMainWindow):
         image = item.data(Qt.UserRole)
         self.displayImage(image)
         self.displayAnalysisResult(image)
+        self.prefetchNeighbors(item)
 
     def displayImage(self, image):
         try:
-            pixmap = self.getPixmap(cv2.imread(image.path))
+            side = self.getDisplaySide(self.image_label.width(), self.image_label.height())
+            pixmap = self.getDisplayPixmap(image, side)
             if pixmap.isNull():
-                raise ValueError("Failed to create valid pixmap")
-            self.image_label.setPixmap(pixmap)
+                # Originals moved away after their results were saved are not an error,
+                # the result view still shows the saved annotated image
+                self.showMissingImage(image)
+                return
+            self.displayed_image = image
+            self.displayed_pixmap = pixmap
+            self.displayed_side = side
             self.fixImageToView()
         except Exception as e:
             self.showError(f"Error displaying image {image.path}: {str(e)}")
 
+    def showMissingImage(self, image):
+        self.displayed_image = None
+        self.displayed_pixmap = None
+        self.displayed_side = 0
+        self.image_label.clear()
+        self.image_label.setText("Image not available")
+        self.updateStatus(f"Image not available: {image.path}")
+
+    def getDisplaySide(self, width, height):
+        target_side = max(width, height)
+        for side in self.DISPLAY_SIDES:
+            if side >= target_side:
+                return side
+        return self.DISPLAY_SIDES[-1]
+
+    def getDisplayPixmap(self, image, side):
+        # Pixmaps are cached per image and display size, decoding happens at reduced resolution
+        key = f"{image.path}|{image.modified_time}|{side}"
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None or pixmap.isNull():
+            pixmap = self.getPixmap(self.thumbnail_cache.getThumbnail(image.path, side))
+            if not pixmap.isNull():
+                QPixmapCache.insert(key, pixmap)
+        return pixmap
+
     def displayAnalysisResult(self, image):
+        # Both images are decoded at reduced size, never at full resolution
         result = self.result_manager.getResult(image.path)
         if result:
-            original_image = cv2.imread(image.path)
-            analyzed_image = self.drawBoundingBoxes(original_image.copy(), result['predictions'], result['bounding_boxes'])
+            original_image = self.thumbnail_cache.getThumbnail(image.path, self.RESULT_SIDE)
+            annotated_path = self.annotated_paths.get(image.path)
+            if annotated_path is not None and os.path.exists(annotated_path):
+                # Loaded results show the saved annotated image, also when the original is missing
+                analyzed_image = self.thumbnail_cache.getThumbnail(annotated_path, self.RESULT_SIDE)
+            else:
+                analyzed_image = self.drawReducedBoxes(image, original_image, result)
             self.displayAnalyzedImage(original_image, analyzed_image, result['predictions'], result['bounding_boxes'])
 
+    def drawReducedBoxes(self, image, reduced_image, result):
+        # The boxes are in full resolution coordinates, scale them to the reduced image
+        size = getImageSize(image.path)
+        if reduced_image is None or size is None:
+            return None
+        scale = reduced_image.shape[1] / size[0]
+        return self.drawBoundingBoxes(reduced_image.copy(), result['predictions'], result['bounding_boxes'], scale)
+
     def fixImageToView(self):
-        if self.image_label.pixmap():
+        if self.displayed_pixmap is not None:
             available_width = self.image_label.width() - 20
             available_height = self.image_label.height() - 20
+            # Grow to a bigger decode when the view outgrows the current one
+            side = self.getDisplaySide(available_width, available_height)
+            if side > self.displayed_side:
+                pixmap = self.getDisplayPixmap(self.displayed_image, side)
+                if not pixmap.isNull():
+                    self.displayed_pixmap = pixmap
+                    self.displayed_side = side
+            # Always scale from the decoded pixmap, never from an already scaled one
             self.image_label.setPixmap(
-                self.image_label.pixmap().scaled(
+                self.displayed_pixmap.scaled(
                     available_width,
                     available_height,
                     Qt.KeepAspectRatio,
@@ -293,8 +454,11 @@ class UserInterface(QMainWindow):
             )
 
     def onImageClick(self, event):
-        if self.image_label.pixmap():
-            self.showEnlargedImage(self.image_label.pixmap())
+        # The enlarged dialog is the only place showing the full resolution
+        if self.displayed_image is not None:
+            pixmap = self.getPixmap(cv2.imread(self.displayed_image.path))
+            if not pixmap.isNull():
+                self.showEnlargedImage(pixmap)
 
     def showEnlargedImage(self, pixmap):
         dialog = QDialog(self)
@@ -321,30 +485,105 @@ class UserInterface(QMainWindow):
         dialog.exec_()
 
     def analyzeImages(self):
-        selected_model = self.model_combo.currentText()
-        try:
-            self.image_analyzer.setModel(selected_model)
-        except Exception as e:
-            self.showError(f"Failed to load model: {str(e)}")
+        if self.isAnalysisRunning():
+            self.showWarning("An analysis is already running.")
             return
 
-        total_images = len(self.current_images)
-        successful_analyses = 0
-        for i, image in enumerate(self.current_images, 1):
-            try:
-                self.analyzeImage(image, selected_model)
-                successful_analyses += 1
-                self.updateStatus(f"Analyzed {i}/{total_images} images")
-            except Exception as e:
-                self.showError(f"Error analyzing image {image.path}: {str(e)}")
-
-        self.showInfo(f"Analysis complete. Successfully analyzed {successful_analyses}/{total_images} images.")
-        
-    def analyzeImage(self, image, model_name):
-        original_image = cv2.imread(image.path)
-        annotated_image, text, predictions, bounding_boxes = self.image_analyzer.analyze(image.path)
+        selected_model = self.model_combo.currentText()
+        images = self.current_images
+        exporter = None
+        if self.stream_checkbox.isChecked():
+            exporter = self.createStreamingExporter()
+            if exporter is None:
+                return
+            # Images exported by an interrupted run are not analyzed again
+            images = [image for image in images if not exporter.isExported(image.path)]
+
+        self.analysis_thread = QThread(self)
+        self.analysis_worker = AnalysisWorker(self.image_analyzer, images, selected_model,
+                                              self.batch_analyzer, exporter, self.RESULT_SIDE)
+        self.analysis_worker.moveToThread(self.analysis_thread)
+
+        self.analysis_thread.started.connect(self.analysis_worker.run)
+        self.analysis_worker.imageAnalyzed.connect(self.onImageAnalyzed)
+        self.analysis_worker.imageFailed.connect(self.onImageFailed)
+        self.analysis_worker.imageTimed.connect(self.onImageTimed)
+        self.analysis_worker.modelFailed.connect(self.onModelFailed)
+        self.analysis_worker.progress.connect(self.onAnalysisProgress)
+        self.analysis_worker.finished.connect(self.onAnalysisFinished)
+        self.analysis_worker.finished.connect(self.analysis_thread.quit)
+        self.analysis_thread.finished.connect(self.onAnalysisThreadFinished)
+
+        self.progress_bar.setRange(0, len(images))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.show()
+        self.updateStatus(f"Analyzing {len(images)} images with '{selected_model}'...")
+        self.analysis_thread.start()
+
+    def createStreamingExporter(self):
+        save_folder = QFileDialog.getExistingDirectory(self, "Select Folder to Save Results")
+        if not save_folder:
+            return None
+        folder_name = self.getFolderNameFromUser()
+        if not folder_name:
+            return None
+
+        result_folder = os.path.join(save_folder, folder_name)
+        resume = False
+        if os.path.exists(os.path.join(result_folder, METADATA_LOG_FILENAME)):
+            resume = self.showConfirmDialog("Resume Export", f"The folder '{folder_name}' contains an export. "
+                                            "Do you want to resume it? Otherwise it is overwritten.")
+        elif os.path.exists(result_folder):
+            if not self.showConfirmDialog("Folder Exists", f"The folder '{folder_name}' already exists. Do you want to overwrite it?"):
+                return None
+        return StreamingExporter(self.result_exporter, result_folder, resume=resume)
+
+    def isAnalysisRunning(self):
+        return self.analysis_thread is not None
+
+    def cancelAnalysis(self):
+        if self.analysis_worker is not None:
+            self.analysis_worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.updateStatus("Cancelling analysis...")
+
+    def onImageAnalyzed(self, image, model_name, original_image, annotated_image, text, predictions, bounding_boxes):
+        # Results of images removed while the analysis was running are dropped
+        if image not in self.current_images:
+            return
         self.result_manager.addResult(image.path, model_name, text, predictions, bounding_boxes)
-        self.displayAnalyzedImage(original_image, annotated_image, predictions, bounding_boxes)
+        self.annotated_paths.pop(image.path, None)
+
+        # Only follow the analysis when the user is not browsing another image
+        current_item = self.image_list.currentItem()
+        if current_item is None or current_item.data(Qt.UserRole) is image:
+            self.displayAnalyzedImage(original_image, annotated_image, predictions, bounding_boxes)
+
+    def onImageFailed(self, image, message):
+        self.showError(f"Error analyzing image {image.path}: {message}")
+
+    def onModelFailed(self, message):
+        self.showError(f"Failed to load model: {message}")
+
+    def onAnalysisProgress(self, analyzed, total_images):
+        self.progress_bar.setValue(analyzed)
+        self.updateStatus(f"Analyzed {analyzed}/{total_images} images")
+
+    def onAnalysisFinished(self, successful_analyses, total_images, cancelled):
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        if cancelled:
+            self.showInfo(f"Analysis cancelled. Successfully analyzed {successful_analyses}/{total_images} images.")
+        else:
+            self.showInfo(f"Analysis complete. Successfully analyzed {successful_analyses}/{total_images} images.")
+
+    def onAnalysisThreadFinished(self):
+        self.analysis_worker.deleteLater()
+        self.analysis_thread.deleteLater()
+        self.analysis_worker = None
+        self.analysis_thread = None
 
     def displayAnalyzedImage(self, original_image, analyzed_image, predictions, bounding_boxes):
         result_widget = QWidget()
@@ -361,7 +600,7 @@ class UserInterface(QMainWindow):
             container_layout = QVBoxLayout(container)
             container_layout.addWidget(QLabel(label_text))
             image_label = QLabel()
-            pixmap = self.getPixmap(image)
+            pixmap = self.getPixmap(fitToSide(image, self.COMPARISON_SIDE) if image is not None else None)
             image_label.setPixmap(pixmap)
             image_label.setScaledContents(True)
             # Change the fixed size
@@ -372,11 +611,30 @@ class UserInterface(QMainWindow):
             layout.addWidget(container)
         return widget
 
+    def findBoxes(self):
+        labels = sorted(self.result_manager.countByLabel())
+        if not labels:
+            self.showWarning("There are no results to search.")
+            return
+        label, ok = QInputDialog.getItem(self, "Find Boxes", "Label:", ["All labels"] + labels, 0, False)
+        if not ok:
+            return
+        max_confidence, ok = QInputDialog.getDouble(self, "Find Boxes", "Maximum confidence:", 0.6, 0.0, 1.0, 2)
+        if not ok:
+            return
+
+        boxes = self.result_manager.queryBoxes(label=None if label == "All labels" else label,
+                                               max_confidence=max_confidence)
+        result_text = f"{len(boxes)} boxes with confidence up to {max_confidence:.2f}:\n"
+        for box in boxes:
+            result_text += (f"{os.path.basename(box['image_path'])} Box {box['box']}: {box['label']} "
+                            f"(Confidence: {box['confidence']:.2f})\n")
+        label_widget = QLabel(result_text)
+        label_widget.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.results_view.setWidget(label_widget)
+
     def createResultTextWidget(self, predictions, bounding_boxes):
-        result_text = "Predictions:\n"
-        for i, (pred, bbox) in enumerate(zip(predictions, bounding_boxes), 1):
-            result_text += f"Box {i}: {pred['label']} (Confidence: {pred['confidence']:.2f})\n"
-            result_text += f"  Coordinates: Top-Left {bbox[0]}, Bottom-Right {bbox[1]}\n"
+        result_text = "Predictions:\n" + self.result_exporter.formatPredictions(predictions, bounding_boxes)
         label = QLabel(result_text)
         label.setWordWrap(True)
         return label
@@ -400,9 +658,15 @@ class UserInterface(QMainWindow):
         return pixmap
 
     def clear(self):
+        self.cancelAnalysis()
         self.current_images.clear()
         self.image_list.clear()
         self.image_label.clear()
+        self.displayed_image = None
+        self.displayed_pixmap = None
+        self.displayed_side = 0
+        self.annotated_paths.clear()
+        self.load_generation += 1
         self.results_view.setWidget(QWidget())
         self.result_manager.clearResult()
         self.updateStatus("All data cleared")
@@ -431,22 +695,82 @@ class UserInterface(QMainWindow):
                 classes = classes_info.get(model_name, [])
                 if not classes:
                     raise ValueError(f"No classes found for model '{model_name}' in the JSON file.")
+
+                preprocessing, ok = QInputDialog.getItem(self, "Preprocessing", "Select the preprocessing profile:",
+                                                         list(PREPROCESSING_PROFILES), 0, False)
+                if not ok:
+                    return
                 
-                self.model_manager.addModel(model_name, model_file, classes)
+                self.model_manager.addModel(model_name, model_file, classes, preprocessing)
                 self.updateModelCombo()
                 self.updateStatus(f"Model '{model_name}' added successfully")
+                self.offerQuantization(model_name)
             else:
                 raise ValueError("Model name is required.")
         except Exception as e:
             self.showError(f"Failed to load model: {str(e)}")
 
+    def offerQuantization(self, model_name):
+        if not self.current_images or self.isAnalysisRunning():
+            return
+        if not self.showConfirmDialog("Quantize Model",
+                                      f"Create an int8 variant of '{model_name}' calibrated on the loaded images?"):
+            return
+
+        # Runs in the analysis thread slot, so it never overlaps with an analysis
+        self.analysis_thread = QThread(self)
+        self.analysis_worker = QuantizationWorker(self.model_manager, self.image_analyzer, model_name,
+                                                  [image.path for image in self.current_images])
+        self.analysis_worker.moveToThread(self.analysis_thread)
+
+        self.analysis_thread.started.connect(self.analysis_worker.run)
+        self.analysis_worker.quantized.connect(self.onModelQuantized)
+        self.analysis_worker.failed.connect(self.onQuantizationFailed)
+        self.analysis_worker.cancelled.connect(self.onQuantizationCancelled)
+        self.analysis_worker.finished.connect(self.analysis_thread.quit)
+        self.analysis_thread.finished.connect(self.onAnalysisThreadFinished)
+
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.show()
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.show()
+        self.updateStatus(f"Quantizing model '{model_name}'...", 0)
+        self.analysis_thread.start()
+
+    def onModelQuantized(self, quantized_name, report):
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        self.updateModelCombo()
+        self.updateStatus(f"Model '{quantized_name}' added successfully")
+        self.showInfo(
+            f"Model '{quantized_name}' added.\n\n"
+            f"Accuracy drift on {report['samples']} held-out samples "
+            f"(calibrated on {report['calibration_samples']}):\n"
+            f"  Label agreement: {report['label_agreement']:.2%}\n"
+            f"  Mean score difference: {report['mean_score_difference']:.4f}\n"
+            f"  Max score difference: {report['max_score_difference']:.4f}"
+        )
+
+    def onQuantizationFailed(self, message):
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        self.showError(f"Failed to quantize model: {message}")
+
+    def onQuantizationCancelled(self):
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        self.updateStatus("Quantization cancelled")
+
     def removeCustomModel(self):
         selected_model = self.model_combo.currentText()
         if selected_model == 'Default':
             self.showWarning("Cannot remove the default model.")
+        elif self.isAnalysisRunning():
+            self.showWarning("Cannot remove a model while an analysis is running.")
         else:
             if self.showConfirmDialog("Remove Model", f"Are you sure you want to remove '{selected_model}'?"):
                 self.model_manager.removeModel(selected_model)
+                self.image_analyzer.forgetModel(selected_model)
                 self.updateModelCombo()
                 self.updateStatus(f"Model '{selected_model}' removed successfully")
 
@@ -480,114 +804,87 @@ class UserInterface(QMainWindow):
             if not self.showConfirmDialog("Folder Exists", f"The folder '{folder_name}' already exists. Do you want to overwrite it?"):
                 return
 
-        os.makedirs(result_folder, exist_ok=True)
-        saved_results = {}
-
-        for image_path, result in results.items():
-            self.saveAnalyzedImage(image_path, result, result_folder, saved_results)
-
-        self.saveMetadata(result_folder, saved_results)
+        self.result_exporter.saveResults(result_folder, results)
+        self.updateTimingsView()
         self.showInfo(f"Results saved to {result_folder}")
 
-    def saveAnalyzedImage(self, image_path, result, result_folder, saved_results):
-        image = cv2.imread(image_path)
-        if image is None:
-            return
-
-        image = self.drawBoundingBoxes(image, result['predictions'], result['bounding_boxes'])
-        
-        image_filename = f"annotated_{os.path.basename(image_path)}"
-        image_save_path = os.path.join(result_folder, image_filename)
-        cv2.imwrite(image_save_path, image)
-
-        text_filename = f"result_{os.path.basename(image_path)}.txt"
-        text_save_path = os.path.join(result_folder, text_filename)
-        self.saveResultText(text_save_path, image_path, result)
-
-        saved_results[image_filename] = {
-            'image_path': image_save_path,
-            'text_path': text_save_path,
-            'original_path': image_path,
-            'model': result['model'],
-            'classes': self.model_manager.getModelClasses(result['model']),
-            'predictions': result['predictions'],
-            'bounding_boxes': result['bounding_boxes']
-        }
-
-    def saveResultText(self, save_path, image_path, result):
-        with open(save_path, 'w') as f:
-            f.write(f"Image: {os.path.basename(image_path)}\n")
-            f.write(f"Model: {result['model']}\n")
-            f.write(f"Classes: {', '.join(self.model_manager.getModelClasses(result['model']))}\n\n")
-            f.write("Predictions:\n")
-            for i, (pred, bbox) in enumerate(zip(result['predictions'], result['bounding_boxes']), 1):
-                f.write(f"  Box {i}: {pred['label']} (Confidence: {pred['confidence']:.2f})\n")
-                f.write(f"    Coordinates: Top-Left {bbox[0]}, Bottom-Right {bbox[1]}\n")
-
-    def saveMetadata(self, result_folder, saved_results):
-        json_path = os.path.join(result_folder, "analysis_metadata.json")
-        with open(json_path, 'w') as jsonfile:
-            json.dump(saved_results, jsonfile, indent=2)
-
     def loadResults(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Results Folder")
         if folder_path:
             self.loadResultsFromFolder(folder_path)
 
     def loadResultsFromFolder(self, folder_path):
-        json_path = os.path.join(folder_path, "analysis_metadata.json")
-        if not os.path.exists(json_path):
-            self.showError("Invalid results folder. Metadata file not found.")
-            return
-
         try:
-            with open(json_path, 'r') as jsonfile:
-                loaded_results = json.load(jsonfile)
+            loaded_results = loadMetadata(folder_path)
+            if loaded_results is None:
+                self.showError("Invalid results folder. Metadata file not found.")
+                return
             self.clear()
             self.displayLoadedResults(loaded_results, folder_path)
             self.showInfo("Results loaded successfully.")
         except Exception as e:
             self.showError(f"Failed to load results: {str(e)}")
 
-    def displayLoadedResults(self, loaded_results, base_folder):
-        for image_filename, result in loaded_results.items():
-            analyzed_image_path = os.path.join(base_folder, os.path.basename(result['image_path']))
-            original_image_path = result['original_path']
-            
-            image = Image(original_image_path)
+    def displayLoadedResults(self, loaded_results, base_folder, offset=0, page_size=500, generation=None):
+        # Only metadata is read here, images are decoded when selected. The list is filled a page
+        # at a time so the window stays responsive on large result folders.
+        if offset == 0:
+            loaded_results = list(loaded_results.values())
+            generation = self.load_generation
+        elif generation != self.load_generation:
+            # The list was cleared while loading
+            return
+        for result in loaded_results[offset:offset + page_size]:
+            image = Image(result['original_path'])
             self.current_images.append(image)
             self.addImageToList(image)
-
-            self.loadAndDisplayResult(image, analyzed_image_path, result)
-
-    def loadAndDisplayResult(self, image, analyzed_image_path, result):
+            # The saved metadata has no OCR text, a result already in the store is kept as it is and
+            # drawn from the store, the saved annotated image only goes with the loaded result
+            if self.result_manager.getResult(image.path) is None:
+                self.result_manager.addResult(image.path, result['model'], "", result['predictions'],
+                                              result['bounding_boxes'])
+                self.annotated_paths[image.path] = os.path.join(base_folder,
+                                                                os.path.basename(result['image_path']))
+
+        if offset == 0 and self.image_list.count():
+            first_item = self.image_list.item(0)
+            self.image_list.setCurrentItem(first_item)
+            self.displaySelectedImage(first_item)
+        if offset + page_size < len(loaded_results):
+            QTimer.singleShot(0, lambda: self.displayLoadedResults(loaded_results, base_folder,
+                                                                   offset + page_size, page_size, generation))
+
+    def getPrefetchExecutor(self):
+        if self.prefetch_executor is None:
+            self.prefetch_executor = ThreadPoolExecutor(max_workers=2)
+        return self.prefetch_executor
+
+    def prefetchNeighbors(self, item):
+        # Decode the images around the selection in the background, they land in the thumbnail cache
+        for future in self.prefetch_futures:
+            future.cancel()
+        side = self.getDisplaySide(self.image_label.width(), self.image_label.height())
+        row = self.image_list.row(item)
+        self.prefetch_futures = []
+        for neighbor_row in (row + 1, row - 1, row + 2, row - 2):
+            neighbor = self.image_list.item(neighbor_row) if neighbor_row >= 0 else None
+            if neighbor is not None:
+                self.prefetch_futures.append(
+                    self.getPrefetchExecutor().submit(self.prefetchImage, neighbor.data(Qt.UserRole), side))
+
+    def prefetchImage(self, image, side):
         try:
-            original_image = cv2.imread(image.path)
-            analyzed_image = cv2.imread(analyzed_image_path)
-            if original_image is None or analyzed_image is None:
-                raise ValueError("Could not load image from path.")
-            
-            self.result_manager.addResult(
-                image.path,
-                result['model'],
-                "",
-                result['predictions'],
-                result['bounding_boxes']
-            )
-            
-            if image == self.current_images[0]:
-                self.displayAnalyzedImage(original_image, analyzed_image, result['predictions'], result['bounding_boxes'])
-        except Exception as e:
-            self.showError(f"Error displaying image {image.path}: {str(e)}")
-
-    def drawBoundingBoxes(self, image, predictions, bounding_boxes):
-        for i, (pred, bbox) in enumerate(zip(predictions, bounding_boxes), 1):
-            tl, br = bbox
-            cv2.rectangle(image, tl, br, (0, 255, 0), 2)
-            label = f"Box {i}: {pred['label']}"
-            cv2.putText(image, label, (tl[0], tl[1] - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-        return image
+            self.thumbnail_cache.getThumbnail(image.path, side)
+            self.thumbnail_cache.getThumbnail(image.path, self.RESULT_SIDE)
+            annotated_path = self.annotated_paths.get(image.path)
+            if annotated_path is not None:
+                self.thumbnail_cache.getThumbnail(annotated_path, self.RESULT_SIDE)
+        except OSError:
+            # Missing files are reported when the image is selected
+            pass
+
+    def drawBoundingBoxes(self, image, predictions, bounding_boxes, scale=1.0):
+        return self.result_exporter.drawBoundingBoxes(image, predictions, bounding_boxes, scale)
 
     def showConfirmDialog(self, title, message):
         reply = QMessageBox.question(self, title, message,
@@ -606,6 +903,15 @@ class UserInterface(QMainWindow):
     def updateStatus(self, message, timeout=3000):
         self.statusBar.showMessage(message, timeout)
 
+    def closeEvent(self, event):
+        if self.isAnalysisRunning():
+            self.cancelAnalysis()
+            self.analysis_thread.quit()
+            self.analysis_thread.wait()
+        if self.prefetch_executor is not None:
+            self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.fixImageToView()
\ No newline at end of file